@@ -1,86 +1,114 @@
 import sys
-import json
-import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 from datetime import datetime, timedelta
 import pyqtgraph as pg
+import pyqtgraph.exporters
 from PyQt5 import QtWidgets, QtCore
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+import numpy as np
+from history import COLORS, IntervalIndex, ScheduleLoader, aggregate_blocks, naive_timestamp, open_history
+
+BAR_HEIGHT = 0.6  # Bar thickness in lanes
+LOD_PIXELS = 2.0  # Operations narrower than this are drawn as aggregated blocks
+BLOCK_LEVELS = 4  # Utilisation shades of the aggregated blocks
 
 # --- Gantt Chart Canvas using PyQtGraph ---
 class GanttChartCanvas(pg.PlotWidget):
     def __init__(self, parent=None, tooltip_label=None):
         super().__init__(parent)
         self.tooltip_label = tooltip_label  # Reference to external label for tooltip display
-        self.operation_bars = []
+        self.decoded = None  # DecodedSchedule currently shown
+        self.candidates = np.empty(0, dtype=np.intp)  # Indices of the operations within the time range
+        self.visible = np.empty(0, dtype=np.intp)  # Indices of the operations drawn individually
+        self.index = None  # IntervalIndex of the plotted operations for hover lookups
+        self.hovered = -1  # Operation whose tooltip is shown
         self.setBackground("w")
         self.showGrid(x=True, y=True)
         self.getAxis("bottom").setLabel("Time")
         self.getAxis("left").setLabel("Resources")
+        # One bar item per color class holding all its bars, switching rows only updates the arrays.
+        self.color_items = [pg.BarGraphItem(x0=[], x1=[], y=[], height=BAR_HEIGHT, brush=color, pen=None)
+                            for color in COLORS]
+        # Aggregated blocks, one item per utilisation level (darker is busier)
+        self.block_items = [pg.BarGraphItem(x0=[], x1=[], y=[], height=BAR_HEIGHT, pen=None,
+                                            brush=pg.mkBrush(0, 0, 139, alpha))
+                            for alpha in np.linspace(64, 255, BLOCK_LEVELS).astype(int)]
+        for item in self.color_items + self.block_items:
+            self.addItem(item)
+        self.sim_start_line = pg.InfiniteLine(angle=90, pen=pg.mkPen("r", width=2, style=QtCore.Qt.DashLine))
+        self.sim_start_line.hide()
+        self.addItem(self.sim_start_line)
         self.setMouseTracking(True)
         self.scene().sigMouseMoved.connect(self.on_motion)
-
-    def plot_gantt(self, resources, time_range, sim_start_str):
-        self.clear()
-        self.operation_bars = []
-        y_labels = []
-        color_map = {
-            "Process": "b",
-            "Changeover": "gray",
-            "Wait": "w",
-            "Idle": "w"
-        }
-        for i, resource in enumerate(resources):
-            res_name = resource.get("Name", "Unknown")
-            y_labels.append(res_name)
-            ops = resource.get("Operations", [])
-            for op in ops:
-                start_str = op.get("Start")
-                end_str = op.get("End")
-                if not start_str or not end_str:
-                    continue
-                try:
-                    start_time = datetime.fromisoformat(start_str)
-                    end_time = datetime.fromisoformat(end_str)
-                except Exception as e:
-                    print("Time parsing error:", e)
-                    continue
-                if end_time < time_range[0] or start_time > time_range[1]:
-                    continue
-                op_name = op.get("Name", "")
-                op_order = op.get("Order", "")
-                color = "b"
-                for key, c in color_map.items():
-                    if key.lower() in op_name.lower():
-                        color = c
-                        if key == "Process" and "Rush" in op_order:
-                            color = "r"
-                        if key == "Changeover" and "Rush" in op_order:
-                            color = "orange"
-                        break
-                x_start = start_time.timestamp()
-                x_end = end_time.timestamp()
-                self.plot([x_start, x_end], [i, i], pen=pg.mkPen(color, width=8))
-                self.operation_bars.append((x_start, x_end, i, op))
+        self.plotItem.vb.sigXRangeChanged.connect(self.on_range_changed)
+
+    def plot_gantt(self, decoded, time_range, sim_start_str):
+        """Plot a DecodedSchedule, operations outside time_range are skipped."""
+        self.decoded = decoded
+        range_start, range_end = (naive_timestamp(t) for t in time_range)
+        self.candidates = np.flatnonzero((decoded.end >= range_start) & (decoded.start <= range_end))
+        self.refresh()
+        self.sim_start_line.hide()
         if sim_start_str:
             try:
                 sim_start_dt = datetime.strptime(sim_start_str, "%m/%d/%Y %I:%M:%S %p")
-                self.addItem(pg.InfiniteLine(pos=sim_start_dt.timestamp(), angle=90, pen=pg.mkPen("r", width=2, style=QtCore.Qt.DashLine)))
+                self.sim_start_line.setValue(naive_timestamp(sim_start_dt))
+                self.sim_start_line.show()
             except Exception as e:
                 print("Sim Start time parse error:", e)
     
+    def on_range_changed(self, *args):
+        if self.decoded is not None:
+            self.refresh()
+
+    def refresh(self):
+        """Draw the candidates inside the visible x window. Operations narrower than LOD_PIXELS
+        are merged per lane into utilisation blocks, so zoomed out views stay cheap to draw."""
+        decoded = self.decoded
+        rows = self.candidates
+        view_box = self.plotItem.vb
+        (view_start, view_end), _ = view_box.viewRange()
+        # While auto ranging the view follows the drawn bars, culling would shrink it step by step
+        if not view_box.state["autoRange"][0]:
+            rows = rows[(decoded.end[rows] >= view_start) & (decoded.start[rows] <= view_end)]
+        min_width = LOD_PIXELS * (view_end - view_start) / max(view_box.width(), 1.0)
+        narrow = decoded.end[rows] - decoded.start[rows] < min_width
+        self.visible = rows[~narrow]
+        colors = decoded.color[self.visible]
+        for code, item in enumerate(self.color_items):
+            shown = self.visible[colors == code]
+            item.setOpts(x0=decoded.start[shown], x1=decoded.end[shown],
+                         y=decoded.resource[shown].astype(np.float64), height=BAR_HEIGHT)
+        rows = rows[narrow]
+        lanes, starts, ends, utilisation = aggregate_blocks(decoded.resource[rows], decoded.start[rows],
+                                                            decoded.end[rows], min_width)
+        levels = np.minimum((utilisation * len(self.block_items)).astype(np.intp), len(self.block_items) - 1)
+        for level, item in enumerate(self.block_items):
+            shown = levels == level
+            item.setOpts(x0=starts[shown], x1=ends[shown], y=lanes[shown].astype(np.float64), height=BAR_HEIGHT)
+        # Hover only reports single operations, aggregated blocks have no tooltip
+        self.index = IntervalIndex(decoded.resource[self.visible], decoded.start[self.visible],
+                                   decoded.end[self.visible], self.visible)
+        self.hovered = -1
+
     def on_motion(self, pos):
         mouse_point = self.plotItem.vb.mapSceneToView(pos)
         x, y = mouse_point.x(), mouse_point.y()
-        for x_start, x_end, bar_y, op in self.operation_bars:
-            if x_start <= x <= x_end and abs(y - bar_y) < 0.5:
-                tooltip_text = "\n".join(f"{key}: {value}" for key, value in op.items())
-                if self.tooltip_label:
-                    self.tooltip_label.setText(tooltip_text)
-                return
+        if self.index is None:
+            return
+        lane = int(round(y))
+        j = self.index.find(lane, x) if abs(y - lane) < 0.5 else -1
+        # The tooltip text is only built when the hovered operation changes
+        if j == self.hovered:
+            return
+        self.hovered = j
         if self.tooltip_label:
-            self.tooltip_label.setText("")
+            if j < 0:
+                self.tooltip_label.setText("")
+            else:
+                op = self.decoded.operations[j]
+                self.tooltip_label.setText("\n".join(f"{key}: {value}" for key, value in op.items()))
 
 # --- Main Application Window ---
 class MainWindow(QtWidgets.QMainWindow):
@@ -88,7 +116,8 @@ class MainWindow(QtWidgets.QMainWindow):
         super().__init__()
         self.setWindowTitle("Gantt Chart Viewer")
         self.resize(1200, 800)
-        self.df = None  # DataFrame for the CSV data
+        self.history = None  # Lazily read run history (CsvHistory or ColumnarHistory)
+        self.loader = None  # Decoded schedule cache and parse-ahead worker (ScheduleLoader)
         self.current_row = None
         self.fixed_range_set = False  # Flag to set fixed start/end only once
 
@@ -167,16 +196,23 @@ class MainWindow(QtWidgets.QMainWindow):
     def open_csv(self):
         options = QtWidgets.QFileDialog.Options()
         filename, _ = QtWidgets.QFileDialog.getOpenFileName(self, "Open CSV File", "",
-                                                            "CSV Files (*.csv);;All Files (*)",
+                                                            "CSV Files (*.csv);;Converted Histories (history.json);;All Files (*)",
                                                             options=options)
         if filename:
-            # Read the CSV using semicolon as delimiter.
-            self.df = pd.read_csv(filename, delimiter=";")
-            if not self.df.empty:
-                self.rowSlider.setMaximum(len(self.df) - 1)
+            # Only index the row offsets, rows are parsed when the slider selects them.
+            # A history.json opens the columnar conversion (see history.py), rows are array slices there.
+            if self.loader is not None:
+                self.loader.close()
+            if self.history is not None:
+                self.history.close()
+            self.history = open_history(filename)
+            self.loader = ScheduleLoader(self.history)
+            self.fixed_range_set = False
+            if not self.history.empty:
+                self.rowSlider.setMaximum(len(self.history) - 1)
                 self.rowSlider.setValue(0)  # start at the first row
-                print("CSV Columns:", self.df.columns)
-                print("First row Sim Start:", self.df.iloc[0]['Sim Start'])
+                print("CSV Columns:", self.history.columns)
+                print("First row Sim Start:", self.history.row(0).get("Sim Start"))
                 # Set the fixed start/end time range from row 0.
                 self.set_fixed_time_range()
                 # Update the view for the current row.
@@ -184,11 +220,12 @@ class MainWindow(QtWidgets.QMainWindow):
 
     def set_fixed_time_range(self):
         """Set the chart’s fixed start/end times using the first row of the CSV."""
-        if self.df is None or self.fixed_range_set:
+        if self.history is None or self.fixed_range_set:
             return
+        first_row = self.history.row(0)
 
         try:
-            fixed_start_str = self.df.iloc[0]["Sim Start"]
+            fixed_start_str = first_row["Sim Start"]
             dt_obj = datetime.strptime(fixed_start_str, "%m/%d/%Y %I:%M:%S %p")
             fixed_start_qdatetime = QtCore.QDateTime(dt_obj.year, dt_obj.month, dt_obj.day,
                                                      dt_obj.hour, dt_obj.minute, dt_obj.second)
@@ -198,7 +235,7 @@ class MainWindow(QtWidgets.QMainWindow):
 
         try:
             # Adjust key name if needed (note: leading/trailing spaces may occur).
-            fixed_end_str = self.df.iloc[0]["Sim Start"].strip()  # remove extra spaces
+            fixed_end_str = first_row["Sim Start"].strip()  # remove extra spaces
             dt_obj = datetime.strptime(fixed_end_str, "%m/%d/%Y %I:%M:%S %p") - timedelta(hours=-32)
             fixed_end_qdatetime = QtCore.QDateTime(dt_obj.year, dt_obj.month, dt_obj.day,
                                                    dt_obj.hour, dt_obj.minute, dt_obj.second)
@@ -212,12 +249,15 @@ class MainWindow(QtWidgets.QMainWindow):
         self.update_view()
 
     def update_view(self):
-        if self.df is None:
+        if self.history is None or self.history.empty:
             return
 
-        # Use the slider value to pick the current row.
+        # Use the slider value to pick the current row. Its metadata and decoded schedule come
+        # from the loader (cached or decoded ahead), then the worker reads the following rows
+        # while this one is drawn.
         row_index = self.rowSlider.value()
-        self.current_row = self.df.iloc[row_index]
+        self.current_row, decoded = self.loader.get(row_index)
+        self.loader.prefetch(row_index)
         # Update metadata display (adjust keys as needed).
         meta_keys = ["Generation", "Individual", "Fitness", "Age", "Measure", "Mean", "Std"]
         meta_text = " | ".join(f"{key}: {self.current_row.get(key, '')}" for key in meta_keys)
@@ -231,17 +271,8 @@ class MainWindow(QtWidgets.QMainWindow):
         # Use the current row’s simulation start (for the moving vertical line).
         sim_start = self.current_row.get("Sim Start", None)
 
-        # Get the schedule JSON data from the last column.
-        json_data_str = self.current_row.iloc[-1]
-        try:
-            schedule_data = json.loads(json_data_str)
-        except Exception as e:
-            print("Error parsing JSON:", e)
-            schedule_data = {}
-
-        resources = schedule_data.get("Resources", [])
         # Update (redraw) the Gantt chart.
-        self.canvas.plot_gantt(resources, time_range, sim_start)
+        self.canvas.plot_gantt(decoded, time_range, sim_start)
 
     def toggle_play(self, checked):
         """Start or stop the automatic slider movement."""
@@ -269,10 +300,14 @@ class MainWindow(QtWidgets.QMainWindow):
         # Export the current chart as an image file.
         options = QtWidgets.QFileDialog.Options()
         filename, _ = QtWidgets.QFileDialog.getSaveFileName(self, "Export Chart", "",
-                                                            "PNG Files (*.png);;PDF Files (*.pdf)",
+                                                            "PNG Files (*.png);;SVG Files (*.svg)",
                                                             options=options)
         if filename:
-            self.canvas.fig.savefig(filename)
+            # The pyqtgraph canvas has no matplotlib figure, use its exporters (render.py draws reports headless).
+            if filename.lower().endswith(".svg"):
+                pg.exporters.SVGExporter(self.canvas.plotItem).export(filename)
+            else:
+                pg.exporters.ImageExporter(self.canvas.plotItem).export(filename)
             QtWidgets.QMessageBox.information(self, "Export", f"Chart exported to {filename}")
 
 
@@ -0,0 +1,462 @@
+import json
+import argparse
+import mmap
+import os
+import threading
+import numpy as np
+from collections import OrderedDict
+from datetime import datetime
+
+
+class CsvHistory:
+    """Run history (results.csv) opened lazily: one streaming pass builds the byte offsets of
+    all rows, a row is only read and parsed from the memory map when it is requested."""
+
+    BLOCK = 64 * 1024 * 1024
+
+    def __init__(self, filename, delimiter=";"):
+        self.filename = filename
+        self.delimiter = delimiter
+        self.file = open(filename, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.size() else b""
+        header_end = self.map.find(b"\n")
+        header_end = len(self.map) if header_end < 0 else header_end
+        header = bytes(self.map[:header_end]).decode("utf-8-sig").rstrip("\r")
+        self.columns = [column.strip() for column in header.split(delimiter)]
+        self.offsets = self.build_index(header_end + 1)
+
+    def size(self):
+        self.file.seek(0, 2)
+        return self.file.tell()
+
+    def build_index(self, start):
+        # Newline positions are found block-wise with numpy, rows are [offsets[i], offsets[i + 1])
+        newlines = []
+        for block_start in range(start, len(self.map), self.BLOCK):
+            block = np.frombuffer(self.map[block_start:block_start + self.BLOCK], dtype=np.uint8)
+            newlines.append(np.flatnonzero(block == ord("\n")) + block_start)
+        ends = np.concatenate(newlines) if newlines else np.empty(0, dtype=np.int64)
+        if start < len(self.map) and (len(ends) == 0 or ends[-1] != len(self.map) - 1):
+            ends = np.append(ends, len(self.map))
+        starts = np.concatenate(([start], ends[:-1] + 1)).astype(np.int64)
+        # Skip empty lines (e.g. a trailing "\r\n")
+        keep = ends - starts > 1
+        return np.stack((starts[keep], ends[keep].astype(np.int64)), axis=1)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    @property
+    def empty(self):
+        return len(self.offsets) == 0
+
+    def row(self, index):
+        """Metadata of one row as a dict of strings, the last column holds the schedule JSON."""
+        start, end = self.offsets[index]
+        line = self.map[start:end].decode("utf-8").rstrip("\r")
+        values = line.split(self.delimiter, len(self.columns) - 1)
+        return dict(zip(self.columns, values))
+
+    def schedule(self, index):
+        """Parsed schedule (worker JSON) of one row, empty if the row has none."""
+        json_data_str = self.row(index).get(self.columns[-1], "")
+        if not json_data_str.strip():
+            return {}
+        return json.loads(json_data_str)
+
+    def decoded(self, index):
+        return decode_schedule(self.schedule(index))
+
+    def close(self):
+        if isinstance(self.map, mmap.mmap):
+            self.map.close()
+        self.file.close()
+
+
+# Color classes of the Gantt bars, codes index into COLORS
+COLORS = ["b", "gray", "w", "r", "orange"]
+PROCESS, CHANGEOVER, IDLE, RUSH_PROCESS, RUSH_CHANGEOVER = range(len(COLORS))
+EPOCH = datetime(1970, 1, 1)
+
+
+def naive_timestamp(dt):
+    """Seconds since 1970 of a naive datetime, the time axis of the decoded schedules."""
+    return (dt - EPOCH).total_seconds()
+
+
+def iso_seconds(values):
+    """ISO timestamps converted in one go instead of datetime.fromisoformat per operation."""
+    return np.array(values, dtype="datetime64[us]").astype(np.int64) / 1e6
+
+
+def color_code(op_name, op_order):
+    name = op_name.lower()
+    if "process" in name:
+        return RUSH_PROCESS if "Rush" in op_order else PROCESS
+    if "changeover" in name:
+        return RUSH_CHANGEOVER if "Rush" in op_order else CHANGEOVER
+    if "wait" in name or "idle" in name:
+        return IDLE
+    return PROCESS
+
+
+class DecodedSchedule:
+    """Ready-to-plot arrays of all operations of one schedule (one entry per operation)."""
+
+    def __init__(self, resource_names, resource, start, end, color, operations):
+        self.resource_names = resource_names
+        self.resource = resource      # int16 lane (resource index)
+        self.start = start            # float64 seconds, see naive_timestamp
+        self.end = end
+        self.color = color            # int8 index into COLORS
+        self.operations = operations  # original operation dicts, for tooltips
+
+    def __len__(self):
+        return len(self.start)
+
+
+def decode_schedule(schedule_data):
+    resource_names = []
+    lanes, starts, ends, colors, operations = [], [], [], [], []
+    for i, resource in enumerate(schedule_data.get("Resources", [])):
+        resource_names.append(resource.get("Name", "Unknown"))
+        for op in resource.get("Operations", []):
+            if not op.get("Start") or not op.get("End"):
+                continue
+            lanes.append(i)
+            starts.append(op["Start"])
+            ends.append(op["End"])
+            colors.append(color_code(op.get("Name", ""), op.get("Order", "")))
+            operations.append(op)
+    return DecodedSchedule(resource_names, np.array(lanes, dtype=np.int16), iso_seconds(starts),
+                           iso_seconds(ends), np.array(colors, dtype=np.int8), operations)
+
+
+def aggregate_blocks(lanes, start, end, min_width):
+    """Merge operations of a lane whose gaps are below min_width into blocks.
+    Returns (lane, start, end, utilisation) per block, utilisation is the busy share of the block."""
+    if len(start) == 0:
+        return lanes[:0], start[:0], end[:0], start[:0]
+    order = np.lexsort((start, lanes))
+    lanes, start, end = lanes[order], start[order], end[order]
+    # Lanes are shifted apart on the time axis so one running maximum covers all of them
+    span = end.max() - start.min() + 2 * min_width + 1
+    offset = (lanes - lanes.min()) * span
+    reach = np.maximum.accumulate(end + offset)
+    first = np.ones(len(start), dtype=bool)
+    first[1:] = (lanes[1:] != lanes[:-1]) | (start[1:] + offset[1:] > reach[:-1] + min_width)
+    heads = np.flatnonzero(first)
+    block_start = start[heads]
+    block_end = np.maximum.reduceat(end, heads)
+    busy = np.add.reduceat(end - start, heads)
+    length = np.maximum(block_end - block_start, 1e-9)
+    return lanes[heads], block_start, block_end, np.minimum(busy / length, 1.0)
+
+
+class ScheduleLoader:
+    """Metadata and decoded schedules of a history. Recent rows are kept in an LRU cache and a
+    background thread decodes the rows ahead of the current one, so play mode and scrubbing
+    rarely read or parse a row on the GUI thread."""
+
+    def __init__(self, history, capacity=256, ahead=16):
+        self.history = history
+        self.capacity = capacity
+        self.ahead = ahead
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.condition = threading.Condition(self.lock)
+        self.target = None
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def lookup(self, index):
+        with self.lock:
+            entry = self.cache.get(index)
+            if entry is not None:
+                self.cache.move_to_end(index)
+            return entry
+
+    def store(self, index, entry):
+        with self.lock:
+            self.cache[index] = entry
+            self.cache.move_to_end(index)
+            while len(self.cache) > self.capacity:
+                self.cache.popitem(last=False)
+
+    def decode(self, index):
+        """(metadata, decoded schedule) of a row, the metadata without the schedule JSON."""
+        row = self.history.row(index)
+        row.pop(self.history.columns[-1], None)
+        try:
+            return row, self.history.decoded(index)
+        except Exception as e:
+            print("Error parsing JSON:", e)
+            return row, decode_schedule({})
+
+    def get(self, index):
+        """(metadata, decoded schedule) of a row, decoded right away if the worker has not got to it yet."""
+        entry = self.lookup(index)
+        if entry is None:
+            entry = self.decode(index)
+            self.store(index, entry)
+        return entry
+
+    def prefetch(self, index):
+        """Let the worker decode the rows following index (wrapping around like play mode)."""
+        with self.condition:
+            self.target = index
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.running and self.target is None:
+                    self.condition.wait()
+                if not self.running:
+                    return
+                target, self.target = self.target, None
+            for step in range(1, self.ahead + 1):
+                index = (target + step) % len(self.history)
+                if self.target is not None or not self.running:
+                    break  # the slider moved on, start from the new position
+                if self.lookup(index) is None:
+                    self.store(index, self.decode(index))
+
+    def close(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.thread.join()
+
+
+class IntervalIndex:
+    """Operations sorted by start per lane, finds the operation under a point with a binary search."""
+
+    def __init__(self, lanes, start, end, indices):
+        order = np.lexsort((start, lanes))
+        self.lanes = lanes[order]
+        self.start = start[order]
+        self.end = end[order]
+        self.indices = indices[order]
+        # Running maximum of the ends within each lane, bounds the backwards scan for overlaps
+        self.reach = self.end.copy()
+        self.bounds = {}
+        for lane in np.unique(self.lanes):
+            first, last = np.searchsorted(self.lanes, [lane, lane + 1])
+            self.reach[first:last] = np.maximum.accumulate(self.end[first:last])
+            self.bounds[int(lane)] = (first, last)
+
+    def find(self, lane, x):
+        """Index of the operation on lane covering x, -1 if there is none."""
+        if lane not in self.bounds:
+            return -1
+        first, last = self.bounds[lane]
+        k = first + np.searchsorted(self.start[first:last], x, side="right") - 1
+        while k >= first and self.reach[k] >= x:
+            if self.end[k] >= x:
+                return int(self.indices[k])
+            k -= 1
+        return -1
+
+
+class OperationRecords:
+    """Operation dicts of a columnar row, built on access (only the hovered one is ever needed)."""
+
+    def __init__(self, history, ids):
+        self.history = history
+        self.ids = ids  # positions in the operation columns
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        return self.history.operation(int(self.ids[index]))
+
+
+class ColumnarHistory:
+    """Run history converted by write_columnar: a directory of .npy columns opened as memory maps.
+    Operations of all rows are concatenated, row i stores operations offsets[i]:offsets[i + 1].
+    Names and metadata are stored as codes into one string table, timestamps as int64 microseconds.
+
+    Every keyframe-th row stores its full schedule, the rows in between only store the operations
+    added since the previous row, plus the positions (in the previous row) of the removed ones,
+    removed[removed_offsets[i]:removed_offsets[i + 1]]. A moved operation is removed and added."""
+
+    MANIFEST = "history.json"
+    COLUMNS = ("meta", "offsets", "resource_offsets", "resources", "lane", "name", "unit", "order",
+               "duration", "start", "end", "color")
+    DELTA_COLUMNS = ("removed", "removed_offsets")
+
+    def __init__(self, path):
+        self.path = path if os.path.isdir(path) else os.path.dirname(path)
+        with open(os.path.join(self.path, self.MANIFEST), encoding="utf-8") as file:
+            manifest = json.load(file)
+        self.columns = manifest["columns"]
+        self.strings = manifest["strings"]
+        self.keyframe = manifest.get("keyframe", 1)
+        columns = self.COLUMNS + (self.DELTA_COLUMNS if self.keyframe > 1 else ())
+        for column in columns:
+            setattr(self, column, np.load(os.path.join(self.path, f"{column}.npy"), mmap_mode="r"))
+        # Last rebuilt row, play mode moves forward one delta at a time from here
+        self.lock = threading.Lock()
+        self.last = (-1, None)
+
+    def __len__(self):
+        return len(self.meta)
+
+    @property
+    def empty(self):
+        return len(self.meta) == 0
+
+    def row(self, index):
+        """Metadata of one row as a dict of strings (without the schedule column)."""
+        return dict(zip(self.columns[:-1], (self.strings[code] for code in self.meta[index])))
+
+    def operation(self, k):
+        strings = self.strings
+        start, end = np.array([self.start[k], self.end[k]], dtype="datetime64[us]")
+        return {"Name": strings[self.name[k]], "Unit": strings[self.unit[k]], "Order": strings[self.order[k]],
+                "Duration": strings[self.duration[k]], "Start": str(start), "End": str(end)}
+
+    def operation_ids(self, index):
+        """Positions of the operations of a row in the columns, keyframe plus applied deltas."""
+        first, last = int(self.offsets[index]), int(self.offsets[index + 1])
+        if index % self.keyframe == 0:
+            return np.arange(first, last)
+        with self.lock:
+            cached, ids = self.last
+        keyframe = index - index % self.keyframe
+        if not keyframe <= cached <= index:
+            cached, ids = keyframe, np.arange(self.offsets[keyframe], self.offsets[keyframe + 1])
+        for row in range(cached + 1, index + 1):
+            keep = np.ones(len(ids), dtype=bool)
+            keep[self.removed[self.removed_offsets[row]:self.removed_offsets[row + 1]]] = False
+            ids = np.concatenate((ids[keep], np.arange(self.offsets[row], self.offsets[row + 1])))
+        with self.lock:
+            self.last = (index, ids)
+        return ids
+
+    def decoded(self, index):
+        """Keyframes are slices of the memory mapped columns, delta rows gather their operations."""
+        names = [self.strings[code] for code in
+                 self.resources[self.resource_offsets[index]:self.resource_offsets[index + 1]]]
+        ids = self.operation_ids(index)
+        if self.keyframe == 1 or index % self.keyframe == 0:
+            rows = slice(int(self.offsets[index]), int(self.offsets[index + 1]))
+        else:
+            rows = ids
+        return DecodedSchedule(names, self.lane[rows], self.start[rows] / 1e6, self.end[rows] / 1e6,
+                               self.color[rows], OperationRecords(self, ids))
+
+    def schedule(self, index):
+        """Schedule of one row in the worker JSON layout, for callers expecting CsvHistory."""
+        decoded = self.decoded(index)
+        resources = [{"Name": name, "Operations": []} for name in decoded.resource_names]
+        for lane, k in zip(decoded.resource.tolist(), range(len(decoded))):
+            resources[lane]["Operations"].append(decoded.operations[k])
+        return {"Resources": resources} if resources else {}
+
+    def close(self):
+        for column in self.COLUMNS + self.DELTA_COLUMNS:
+            setattr(self, column, None)
+
+
+def write_columnar(history, path, keyframe=1):
+    """Convert a CsvHistory into the directory layout read by ColumnarHistory, a full schedule
+    is stored every keyframe rows and deltas against the previous row in between."""
+    if keyframe < 1:
+        raise ValueError(f"keyframe must be at least 1, got {keyframe}")
+    codes = {}
+    intern = lambda value: codes.setdefault(value, len(codes))
+    meta = []
+    offsets, resource_offsets, removed_offsets = [0], [0], [0]
+    resources, operations, removed = [], [], []
+    current = []  # operations of the previous row in the order the reader rebuilds them
+    for index in range(len(history)):
+        row = history.row(index)
+        meta.append([intern(row.get(column, "")) for column in history.columns[:-1]])
+        try:
+            schedule = history.schedule(index)
+        except Exception as e:
+            print(f"Error parsing JSON of row {index}:", e)
+            schedule = {}
+        ops = []
+        for i, resource in enumerate(schedule.get("Resources", [])):
+            resources.append(intern(resource.get("Name", "Unknown")))
+            for op in resource.get("Operations", []):
+                if not op.get("Start") or not op.get("End"):
+                    continue
+                ops.append((i, intern(op.get("Name", "")), intern(str(op.get("Unit", ""))),
+                            intern(op.get("Order", "")), intern(str(op.get("Duration", ""))),
+                            op["Start"], op["End"], color_code(op.get("Name", ""), op.get("Order", ""))))
+        if index % keyframe == 0:
+            added, current = ops, ops
+        else:
+            # Unchanged operations are matched to a position of the previous row
+            positions = {}
+            for k, op in enumerate(current):
+                positions.setdefault(op, []).append(k)
+            kept, added = [], []
+            for op in ops:
+                matches = positions.get(op)
+                if matches:
+                    kept.append(matches.pop())
+                else:
+                    added.append(op)
+            gone = sorted(k for matches in positions.values() for k in matches)
+            removed.extend(gone)
+            gone = set(gone)
+            current = [op for k, op in enumerate(current) if k not in gone] + added
+        operations.extend(added)
+        offsets.append(len(operations))
+        resource_offsets.append(len(resources))
+        removed_offsets.append(len(removed))
+
+    os.makedirs(path, exist_ok=True)
+    code = np.uint16 if len(codes) <= np.iinfo(np.uint16).max else np.int32
+    fields = list(zip(*operations)) if operations else [()] * 8
+    columns = {
+        "meta": np.array(meta, dtype=code).reshape(len(meta), len(history.columns) - 1),
+        "offsets": np.array(offsets, dtype=np.int64),
+        "resource_offsets": np.array(resource_offsets, dtype=np.int64),
+        "resources": np.array(resources, dtype=code),
+        "lane": np.array(fields[0], dtype=np.int16),
+        "name": np.array(fields[1], dtype=code),
+        "unit": np.array(fields[2], dtype=code),
+        "order": np.array(fields[3], dtype=code),
+        "duration": np.array(fields[4], dtype=code),
+        "start": np.array(fields[5], dtype="datetime64[us]").astype(np.int64),
+        "end": np.array(fields[6], dtype="datetime64[us]").astype(np.int64),
+        "color": np.array(fields[7], dtype=np.int8),
+        "removed": np.array(removed, dtype=np.int32),
+        "removed_offsets": np.array(removed_offsets, dtype=np.int64),
+    }
+    for column, values in columns.items():
+        np.save(os.path.join(path, f"{column}.npy"), values)
+    # The manifest is written last, a directory without one is an incomplete conversion
+    with open(os.path.join(path, ColumnarHistory.MANIFEST), "w", encoding="utf-8") as file:
+        json.dump({"columns": history.columns, "strings": list(codes), "keyframe": keyframe}, file)
+
+
+def open_history(filename):
+    """CsvHistory or ColumnarHistory, depending on the file picked."""
+    if os.path.isdir(filename) or os.path.basename(filename) == ColumnarHistory.MANIFEST:
+        return ColumnarHistory(filename)
+    return CsvHistory(filename, delimiter=";")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a results.csv run history for the Gantt viewer.")
+    parser.add_argument("source")
+    parser.add_argument("target", nargs="?")
+    parser.add_argument("--keyframe", type=int, default=1, help="store a full schedule every N rows")
+    args = parser.parse_args()
+    if args.keyframe < 1:
+        parser.error("--keyframe must be at least 1")
+    target = args.target or os.path.splitext(args.source)[0] + ".history"
+    csv_history = CsvHistory(args.source)
+    write_columnar(csv_history, target, args.keyframe)
+    csv_history.close()
+    size = sum(os.path.getsize(os.path.join(target, file)) for file in os.listdir(target))
+    print(f"{len(csv_history)} rows, {os.path.getsize(args.source)} -> {size} bytes in {target}")
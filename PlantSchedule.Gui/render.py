@@ -0,0 +1,145 @@
+"""Headless Gantt rendering of a run history (CSV or converted, see history.py) for reports.
+
+    python render.py results.csv out --every 10 --format png
+    python render.py results.history out --format gif --fps 4
+
+Frames are drawn with matplotlib's Agg backend in a process pool, no Qt event loop is needed.
+GIFs are assembled with Pillow, MP4s with the ffmpeg executable."""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+from datetime import datetime, timedelta
+from multiprocessing import Pool
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import PolyCollection
+from matplotlib.figure import Figure
+import matplotlib.dates as mdates
+from history import COLORS, naive_timestamp, open_history
+
+SIM_START_FORMAT = "%m/%d/%Y %I:%M:%S %p"
+BAR_HEIGHT = 0.6
+FIGSIZE = (12, 6)
+
+# Worker state, the history is opened once per process by init_worker
+history = None
+
+
+def init_worker(filename):
+    global history
+    history = open_history(filename)
+
+
+def default_time_range(run_history, hours=32):
+    """Chart range of the viewer: Sim Start of the first row plus hours."""
+    start = datetime.strptime(run_history.row(0)["Sim Start"].strip(), SIM_START_FORMAT)
+    return start, start + timedelta(hours=hours)
+
+
+def draw_frame(run_history, index, time_range, filename, dpi=100):
+    """Draw one row of the history into filename (format taken from its extension), rows without
+    a schedule are skipped and give None."""
+    decoded = run_history.decoded(index)
+    if len(decoded) == 0:
+        return None
+    row = run_history.row(index)
+    range_start, range_end = (naive_timestamp(t) for t in time_range)
+    shown = (decoded.end >= range_start) & (decoded.start <= range_end)
+    figure = Figure(figsize=FIGSIZE, dpi=dpi)
+    FigureCanvasAgg(figure)
+    ax = figure.add_subplot()
+    # One collection per color instead of a patch per bar, seconds since 1970 / a day are date numbers
+    for code, color in enumerate(COLORS):
+        rows = np.flatnonzero(shown & (decoded.color == code))
+        if len(rows):
+            left, right = decoded.start[rows] / 86400.0, decoded.end[rows] / 86400.0
+            bottom = decoded.resource[rows] - BAR_HEIGHT / 2
+            top = bottom + BAR_HEIGHT
+            vertices = np.stack((np.stack((left, right, right, left), axis=1),
+                                 np.stack((bottom, bottom, top, top), axis=1)), axis=2)
+            ax.add_collection(PolyCollection(vertices, facecolors=color, edgecolors="none"))
+    try:
+        sim_start = datetime.strptime(row.get("Sim Start", "").strip(), SIM_START_FORMAT)
+        ax.axvline(mdates.date2num(sim_start), color="red", linestyle="--")
+    except ValueError:
+        pass
+    ax.set_xlim(mdates.date2num(time_range[0]), mdates.date2num(time_range[1]))
+    ax.set_ylim(len(decoded.resource_names) - 0.5, -0.5)
+    ax.set_yticks(range(len(decoded.resource_names)))
+    ax.set_yticklabels(decoded.resource_names)
+    ax.xaxis_date()
+    ax.grid(True, axis="x", alpha=0.3)
+    ax.set_title(f"Generation {row.get('Generation', '')} | Individual {row.get('Individual', '')} | "
+                 f"Fitness {row.get('Fitness', '')}")
+    figure.autofmt_xdate()
+    figure.savefig(filename, dpi=dpi)
+    return filename
+
+
+def render_task(task):
+    index, time_range, filename, dpi = task
+    return draw_frame(history, index, time_range, filename, dpi)
+
+
+def render(filename, output, every=1, image_format="png", fps=4, hours=32, dpi=100, workers=None):
+    """Render every Nth row of a history into output (a directory for png/svg, a file for gif/mp4)."""
+    if every < 1:
+        raise ValueError(f"every must be at least 1, got {every}")
+    if fps < 1:
+        raise ValueError(f"fps must be at least 1, got {fps}")
+    run_history = open_history(filename)
+    rows = range(0, len(run_history), every)
+    time_range = default_time_range(run_history, hours) if len(run_history) else None
+    run_history.close()
+    animated = image_format in ("gif", "mp4")
+    frames = output + ".frames" if animated else output
+    os.makedirs(frames, exist_ok=True)
+    extension = "png" if animated else image_format
+    tasks = [(index, time_range, os.path.join(frames, f"row_{index:05d}.{extension}"), dpi) for index in rows]
+    with Pool(workers, init_worker, (filename,)) as pool:
+        chunksize = max(1, len(tasks) // (4 * (workers or os.cpu_count())))
+        files = [file for file in pool.map(render_task, tasks, chunksize) if file is not None]
+    if animated and not files:
+        shutil.rmtree(frames)
+        raise RuntimeError("no rows with a schedule to animate")
+    if image_format == "gif":
+        from PIL import Image
+        images = [Image.open(file) for file in files]
+        images[0].save(output, save_all=True, append_images=images[1:], duration=1000 // fps, loop=0)
+    elif image_format == "mp4":
+        ffmpeg = shutil.which("ffmpeg")
+        if ffmpeg is None:
+            raise RuntimeError(f"ffmpeg not found, the frames are left in {frames}")
+        # ffmpeg reads a numbered sequence without gaps
+        for n, file in enumerate(files):
+            os.replace(file, os.path.join(frames, f"frame_{n:05d}.png"))
+        subprocess.run([ffmpeg, "-y", "-loglevel", "error", "-framerate", str(fps),
+                        "-i", os.path.join(frames, "frame_%05d.png"), "-pix_fmt", "yuv420p", output], check=True)
+    if animated:
+        shutil.rmtree(frames)
+    return files
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render Gantt charts of a run history without a display.")
+    parser.add_argument("history", help="results.csv or a converted history (directory or history.json)")
+    parser.add_argument("output", help="directory for png/svg frames, file for gif/mp4")
+    parser.add_argument("--every", type=int, default=1, help="render every Nth row")
+    parser.add_argument("--format", choices=("png", "svg", "gif", "mp4"), default="png")
+    parser.add_argument("--fps", type=int, default=4, help="frames per second of gif/mp4")
+    parser.add_argument("--hours", type=float, default=32, help="chart length from the first Sim Start")
+    parser.add_argument("--dpi", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=None, help="processes, all cores by default")
+    args = parser.parse_args()
+    if args.every < 1:
+        parser.error("--every must be at least 1")
+    if args.fps < 1:
+        parser.error("--fps must be at least 1")
+    try:
+        files = render(args.history, args.output, args.every, args.format, args.fps, args.hours, args.dpi,
+                       args.workers)
+    except RuntimeError as e:
+        sys.exit(str(e))
+    print(f"{len(files)} frames rendered to {args.output}")
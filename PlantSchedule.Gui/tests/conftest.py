@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The viewer modules are imported by their flat names, like the gantt scripts do
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
@@ -0,0 +1,36 @@
+import numpy as np
+from history import IntervalIndex
+
+
+def random_operations(rng, lanes=5, operations=400):
+    """Back-to-back operations per lane with idle gaps, plus long ones overlapping several others."""
+    lane = rng.integers(0, lanes, operations)
+    start = rng.uniform(0.0, 1000.0, operations).round(1)
+    end = start + rng.choice([0.0, 1.0, 5.0, 120.0], operations, p=[0.05, 0.45, 0.4, 0.1])
+    return lane, start, end
+
+
+def test_find_matches_scan():
+    """-1 exactly where no operation of the lane covers the point, else the covering one starting last."""
+    rng = np.random.default_rng(0)
+    lanes, start, end = random_operations(rng)
+    index = IntervalIndex(lanes, start, end, np.arange(len(start)))
+    # Random points, the boundaries themselves, and a lane without operations
+    points = np.concatenate((rng.uniform(-10.0, 1200.0, 2000), start, end))
+    for lane, x in zip(rng.integers(0, lanes.max() + 2, len(points)).tolist(), points.tolist()):
+        covering = (lanes == lane) & (start <= x) & (x <= end)
+        found = index.find(lane, x)
+        if covering.any():
+            assert found >= 0 and covering[found] and start[found] == start[covering].max()
+        else:
+            assert found == -1
+
+
+def test_find_returns_given_indices():
+    index = IntervalIndex(np.array([1, 0, 1]), np.array([0.0, 0.0, 5.0]), np.array([4.0, 2.0, 9.0]),
+                          np.array([10, 20, 30]))
+    assert index.find(0, 1.0) == 20
+    assert index.find(1, 1.0) == 10
+    assert index.find(1, 6.0) == 30
+    assert index.find(1, 4.5) == -1
+    assert index.find(2, 1.0) == -1
@@ -0,0 +1,226 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+import numpy as np
+from plantdata import csv_directory
+from simulator import *
+
+gui_directory = os.path.join(os.path.dirname(__file__), "..", "PlantSchedule.Gui")
+
+# Instances of the default suite: (name, products, stages, machines per stage, orders), None is CsvFiles
+SCALES = [("csvfiles", None, None, None, None), ("medium", 60, 6, 4, 120), ("large", 120, 8, 6, 480)]
+SIMULATION_START = datetime(2020, 1, 1, 8)
+
+
+def write_instance(directory: str, products: int = 30, stages: int = 6, machines_per_stage: int = 3,
+                   orders: int = 31, seed: int = 0) -> str:
+    # Random plant in the CsvFiles schema: every product runs on a random subset of the machines
+    # of most stages, changeovers are 0 on the diagonal. The horizon grows with the number of orders.
+    rng = np.random.default_rng(seed)
+    os.makedirs(directory, exist_ok=True)
+    product_names = [f"P{i + 1:02d}" for i in range(products)]
+    stage_names = [f"S{i + 1}" for i in range(stages)]
+    machine_names = [f"M{i + 1:02d}" for i in range(stages * machines_per_stage)]
+    machine_stage = np.repeat(np.arange(stages), machines_per_stage)
+    with open(os.path.join(directory, "StageMachineMap.csv"), "w", newline="") as file:
+        file.write("," + ",".join(stage_names) + "\n")
+        for machine, stage in zip(machine_names, machine_stage):
+            file.write(machine + "," + ",".join("1" if s == stage else "0" for s in range(stages)) + "\n")
+
+    process_times = rng.uniform(0.2, 2.5, (products, len(machine_names)))
+    eligible = rng.random((products, len(machine_names))) < 0.6
+    skipped = rng.random((products, stages)) < 0.15
+    for stage in range(stages):
+        columns = np.flatnonzero(machine_stage == stage)
+        # At least one machine per processed stage
+        eligible[np.arange(products), rng.choice(columns, products)] = True
+        eligible[np.ix_(skipped[:, stage], columns)] = False
+    process_times[~eligible] = 0.0
+    with open(os.path.join(directory, "ProcessTimes.csv"), "w", newline="") as file:
+        file.write("," + ",".join(machine_names) + "\n")
+        for product, row in zip(product_names, process_times):
+            file.write(product + "," + ",".join(f"{value:.2f}" for value in row) + "\n")
+
+    for stage in stage_names:
+        changeovers = rng.uniform(0.0, 0.6, (products, products))
+        np.fill_diagonal(changeovers, 0.0)
+        with open(os.path.join(directory, f"ChangeoverTimes_{stage}.csv"), "w", newline="") as file:
+            file.write("," + ",".join(product_names) + "\n")
+            for product, row in zip(product_names, changeovers):
+                file.write(product + "," + ",".join(f"{value:.2f}" for value in row) + "\n")
+
+    with open(os.path.join(directory, "Order.csv"), "w", newline="") as file:
+        file.write("Order\n" + "".join(f"{product_names[i]}\n" for i in rng.integers(0, products, orders)))
+    return directory
+
+
+def worker_json(plant: Plant, schedule: Schedule) -> str:
+    # Worker column of results.csv (see ResultsWriter) for a simulated schedule
+    kinds = {OperationType.PROC.value: "Process", OperationType.SETUP.value: "Changeover",
+             OperationType.MAINTENANCE.value: "Maintenance"}
+    operations = schedule.operations
+    resources = []
+    for machine, name in enumerate(plant.machines.names):
+        rows = operations[operations["machine"] == machine]
+        resources.append({"Name": name, "Operations": [
+            {"Name": f"{kinds[op]}_{name}", "Unit": name, "Order": schedule.orders[order] if order >= 0 else "",
+             "Duration": end - start, "Start": (SIMULATION_START + timedelta(hours=start)).isoformat(),
+             "End": (SIMULATION_START + timedelta(hours=end)).isoformat()}
+            for order, _, op, start, end in np.sort(rows, order="start").tolist()]})
+    return json.dumps({"Resources": resources})
+
+
+def write_history(path: str, plant: Plant, orders: list[Order], rows: int = 20, seed: int = 0) -> str:
+    # results.csv with one shuffled schedule per row
+    rng = np.random.default_rng(seed)
+    with open(path, "w", newline="") as file:
+        file.write("Generation;Individual;Fitness;Age;Measure;Mean;Std;Sim Start; Sim End;Stopwatch;Worker\r\n")
+        start = SIMULATION_START.strftime("%m/%d/%Y %I:%M:%S %p")
+        for row in range(rows):
+            schedule = plant.simulate([orders[i] for i in rng.permutation(len(orders))])
+            file.write(f"{row};0;{schedule.makespan};0;0;0;0;{start}; {start};00:00:01;"
+                       f"{worker_json(plant, schedule)}\r\n")
+    return path
+
+
+def timed(function, repeat: int, rounds: int = 3) -> float:
+    # Milliseconds per call, best of a few rounds
+    best = float("inf")
+    for _ in range(rounds):
+        t = time.perf_counter()
+        for _ in range(repeat):
+            function()
+        best = min(best, (time.perf_counter() - t) / repeat)
+    return best * 1000
+
+
+def swap(permutation: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    mutated = permutation.copy()
+    i, j = rng.choice(len(mutated), 2, replace=False)
+    mutated[[i, j]] = mutated[[j, i]]
+    return mutated
+
+
+def bench_incremental(plant: Plant, orders: list[Order], mutations: int = 2000, seed: int = 0) -> dict[str, float]:
+    # Single swap mutations of one parent, evaluated from scratch and from the parent's checkpoint
+    rng = np.random.default_rng(seed)
+    parent = rng.permutation(len(orders))
+    _, checkpoint = plant.evaluate(parent, orders)
+    children = [swap(parent, rng) for _ in range(mutations)]
+
+    t = time.perf_counter()
+    for child in children:
+        plant.evaluate(child, orders)
+    full_time = time.perf_counter() - t
+
+    t = time.perf_counter()
+    for child in children:
+        plant.evaluate(child, orders, checkpoint)
+    incremental_time = time.perf_counter() - t
+
+    return {"full_ms": full_time / mutations * 1000, "incremental_ms": incremental_time / mutations * 1000,
+            "speedup": full_time / incremental_time}
+
+
+def bench_evaluation(plant: Plant, orders: list[Order], population: int = 64, seed: int = 0) -> dict[str, float]:
+    rng = np.random.default_rng(seed)
+    permutations = np.array([rng.permutation(len(orders)) for _ in range(population)])
+    incremental = bench_incremental(plant, orders, mutations=max(50, 20000 // len(orders)), seed=seed)
+    batch = timed(lambda: plant.evaluate_batch(permutations, orders), 5)
+    return {"simulate_ms": timed(lambda: plant.simulate(orders), 10),
+            "evaluate_ms": timed(lambda: plant.evaluate(permutations[0], orders), 10),
+            "batch_ms": batch,
+            "batch_per_individual_ms": batch / population,
+            "bound_ms": timed(lambda: plant.lower_bounds(permutations, orders), 5),
+            "incremental_full_ms": incremental["full_ms"],
+            "incremental_ms": incremental["incremental_ms"]}
+
+
+def bench_viewer(plant: Plant, orders: list[Order], directory: str, rows: int = 10) -> dict[str, float]:
+    # Row decode of the viewer (CSV and columnar history) and a headless frame render
+    if gui_directory not in sys.path:
+        sys.path.append(gui_directory)
+    try:
+        import history
+        import render
+    except ImportError as e:
+        print(f"Viewer benchmarks skipped: {e}")
+        return {}
+    path = write_history(os.path.join(directory, "results.csv"), plant, orders, rows)
+    csv_history = history.CsvHistory(path)
+    history.write_columnar(csv_history, os.path.join(directory, "results.history"))
+    columnar = history.ColumnarHistory(os.path.join(directory, "results.history"))
+    time_range = render.default_time_range(csv_history, hours=max(32.0, 1.2 * float(csv_history.row(0)["Fitness"])))
+    frame = os.path.join(directory, "frame.png")
+    result = {"decode_csv_ms": timed(lambda: [csv_history.decoded(i) for i in range(rows)], 1) / rows,
+              "decode_columnar_ms": timed(lambda: [columnar.decoded(i) for i in range(rows)], 1) / rows,
+              "render_ms": timed(lambda: render.draw_frame(csv_history, 0, time_range, frame), 1, rounds=2)}
+    columnar.close()
+    csv_history.close()
+    return result
+
+
+def run_suite(scales: list[tuple] = SCALES, population: int = 64, viewer: bool = True) -> dict[str, dict[str, float]]:
+    results = {}
+    for name, products, stages, machines_per_stage, order_count in scales:
+        with tempfile.TemporaryDirectory() as directory:
+            if products is None:
+                instance = csv_directory
+            else:
+                instance = write_instance(os.path.join(directory, "instance"), products, stages,
+                                          machines_per_stage, order_count)
+            plant = Plant.from_csv(instance, cache=False)
+            orders = plant.read_orders(os.path.join(instance, "Order.csv"))
+            result = bench_evaluation(plant, orders, population)
+            if viewer:
+                result.update(bench_viewer(plant, orders, directory))
+            results[name] = result
+            print(f"{name}: {len(orders)} orders, {len(plant.machines)} machines, {len(plant.stages)} stages")
+            for key, value in result.items():
+                print(f"  {key:26s} {value:10.3f}")
+    return results
+
+
+def regressions(results: dict[str, dict[str, float]], baseline: dict[str, dict[str, float]],
+                threshold: float = 0.2) -> list[str]:
+    # Timings more than threshold slower than the baseline, metrics missing on either side are skipped
+    slower = []
+    for scale, metrics in results.items():
+        for key, value in metrics.items():
+            reference = baseline.get(scale, {}).get(key)
+            if key.endswith("_ms") and reference and value > reference * (1.0 + threshold):
+                slower.append(f"{scale}.{key}: {value:.3f} ms vs {reference:.3f} ms (+{value / reference - 1.0:.0%})")
+    return slower
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the simulator and viewer on scaled plant instances.")
+    parser.add_argument("--baseline", default=os.path.join(os.path.dirname(__file__), "benchmark.json"),
+                        help="JSON baseline, written if it does not exist")
+    parser.add_argument("--update", action="store_true", help="overwrite the baseline with this run")
+    parser.add_argument("--threshold", type=float, default=0.2, help="relative slowdown flagged as regression")
+    parser.add_argument("--population", type=int, default=64)
+    parser.add_argument("--no-viewer", action="store_true", help="skip the Gantt decode/render timings")
+    parser.add_argument("--instance", nargs=4, type=int, metavar=("PRODUCTS", "STAGES", "MACHINES", "ORDERS"),
+                        help="run a single synthetic instance instead of the default suite")
+    parser.add_argument("--write-instance", metavar="DIRECTORY", help="only write the --instance CSV files")
+    args = parser.parse_args()
+    if args.write_instance:
+        write_instance(args.write_instance, *(args.instance or (30, 6, 3, 31)))
+        sys.exit()
+    scales = [("custom", *args.instance)] if args.instance else SCALES
+    results = run_suite(scales, args.population, not args.no_viewer)
+    if args.update or not os.path.exists(args.baseline):
+        with open(args.baseline, "w") as file:
+            json.dump(results, file, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        sys.exit()
+    with open(args.baseline) as file:
+        slower = regressions(results, json.load(file), args.threshold)
+    for line in slower:
+        print(f"REGRESSION {line}")
+    sys.exit(1 if slower else 0)
@@ -0,0 +1,122 @@
+import hashlib
+import os
+import numpy as np
+from collections import OrderedDict
+from objectives import COLUMNS, evaluate_objectives
+from simulator import Order, Plant
+
+
+class FitnessCache:
+    # Bounded LRU in front of the batch evaluation of the plant. An entry holds makespan, tardiness and
+    # earliness as returned by Plant.evaluate_batch followed by the objectives.OBJECTIVES columns. Keys hash
+    # the order sequence together with the orders (incl. rush orders), maintenance windows and simulation start.
+    WIDTH = 3 + len(COLUMNS)
+    plant: Plant
+    orders: list[Order]
+    capacity: int
+    path: str
+    context: bytes
+    entries: OrderedDict[bytes, tuple[float, ...]]
+    hits: int
+    misses: int
+    evictions: int
+    def __init__(self, plant: Plant, orders: list[Order], simulation_start: str = "",
+                 capacity: int = 100000, path: str = None) -> None:
+        self.plant = plant
+        self.orders = orders
+        self.capacity = capacity
+        self.path = path
+        context = hashlib.blake2b(digest_size=16)
+        for order in orders:
+            context.update(f"{order.name}:{order.release}:{order.due_date};".encode())
+        context.update(f"|{sorted(order.name for order in orders if 'Rush' in order.name)}".encode())
+        context.update(f"|{plant.maintenances}|{simulation_start}".encode())
+        self.context = context.digest()
+        self.entries = OrderedDict()
+        self.hits = self.misses = self.evictions = 0
+        if path and os.path.exists(path):
+            self.load()
+
+    def key(self, permutation: np.ndarray) -> bytes:
+        return hashlib.blake2b(np.ascontiguousarray(permutation, dtype=np.int32).tobytes(),
+                               digest_size=16, key=self.context).digest()
+
+    def get(self, key: bytes) -> tuple[float, ...]:
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return value
+
+    def put(self, key: bytes, value: tuple[float, ...]) -> None:
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def evaluate(self, permutations: np.ndarray) -> np.ndarray:
+        # Entries of the permutations, only distinct permutations that are not cached are decoded, in one batch
+        permutations = np.atleast_2d(permutations)
+        results = np.empty((len(permutations), self.WIDTH))
+        missing = {}
+        for i, permutation in enumerate(permutations):
+            key = self.key(permutation)
+            if key in missing:
+                # Repeat within the batch, it reuses the result of the first copy
+                self.hits += 1
+                missing[key].append(i)
+                continue
+            value = self.get(key)
+            if value is None:
+                missing.setdefault(key, []).append(i)
+            else:
+                results[i] = value
+        if missing:
+            rows = [indices[0] for indices in missing.values()]
+            completion = self.plant.batch_completion(permutations[rows], self.orders)
+            _, releases, due_dates = self.plant.order_arrays(self.orders)
+            lateness = completion - due_dates
+            objectives = evaluate_objectives(completion, due_dates, releases)
+            earliness = np.where(lateness < 0.0, lateness, 0.0).sum(axis=1)
+            evaluated = np.column_stack((objectives[:, COLUMNS["Makespan"]], objectives[:, COLUMNS["Tardiness"]],
+                                         earliness, objectives))
+            for (key, indices), value in zip(missing.items(), evaluated):
+                results[indices] = value
+                self.put(key, tuple(value.tolist()))
+        return results
+
+    def evaluate_batch(self, permutations: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        results = self.evaluate(permutations)
+        return results[:, 0], results[:, 1], results[:, 2]
+
+    def fitness(self, permutations: np.ndarray, objective: str = "Makespan") -> np.ndarray:
+        # Like Plant.fitness, e.g. as evaluate of the EvolutionaryAlgorithm
+        if objective not in COLUMNS:
+            raise ValueError(f"unknown objective {objective}, expected one of {', '.join(COLUMNS)}")
+        return self.evaluate(permutations)[:, 3 + COLUMNS[objective]]
+
+    def stats(self) -> dict[str, int]:
+        return {"size": len(self.entries), "capacity": self.capacity, "hits": self.hits,
+                "misses": self.misses, "evictions": self.evictions}
+
+    def save(self, path: str = None) -> None:
+        path = path or self.path
+        if not path:
+            raise ValueError("no path to save the cache to, pass one here or to the constructor")
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as file:
+            np.savez(file, context=np.frombuffer(self.context, dtype=np.uint8),
+                     keys=np.frombuffer(b"".join(self.entries), dtype=np.uint8).reshape(-1, 16),
+                     values=np.array(list(self.entries.values()), dtype=np.float64).reshape(-1, self.WIDTH))
+        os.replace(temporary, path)
+
+    def load(self, path: str = None) -> None:
+        # Entries of another instance (different context) or of another layout are ignored
+        with np.load(path or self.path) as npz:
+            if npz["context"].tobytes() != self.context or npz["values"].shape[1] != self.WIDTH:
+                return
+            for key, value in zip(npz["keys"], npz["values"].tolist()):
+                self.put(key.tobytes(), tuple(value))
@@ -0,0 +1,160 @@
+import argparse
+import os
+import time
+import numpy as np
+from multiprocessing import Pool
+
+# Elements of the temporaries of one block, rows of a matrix are computed in blocks of this size
+BLOCK_ELEMENTS = 1 << 20
+
+
+def positions(permutations: np.ndarray) -> np.ndarray:
+    # Inverse permutations: position of every order in every row
+    population, n = permutations.shape
+    inverse = np.empty_like(permutations)
+    inverse[np.arange(population)[:, None], permutations] = np.arange(n)
+    return inverse
+
+def block_rows(columns: int, width: int) -> int:
+    return max(1, BLOCK_ELEMENTS // max(1, columns * width))
+
+
+def hamming(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    # Number of positions holding different orders (HammingDistance of the reference)
+    distances = np.empty((len(a), len(b)), dtype=np.int32)
+    step = block_rows(len(b), a.shape[1])
+    for i in range(0, len(a), step):
+        distances[i:i + step] = (a[i:i + step, None, :] != b[None, :, :]).sum(axis=2)
+    return distances
+
+def position_deviation(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    # Sum of the position shifts of every order (Spearman footrule)
+    a, b = positions(a), positions(b)
+    distances = np.empty((len(a), len(b)), dtype=np.int32)
+    step = block_rows(len(b), a.shape[1])
+    for i in range(0, len(a), step):
+        distances[i:i + step] = np.abs(a[i:i + step, None, :] - b[None, :, :]).sum(axis=2)
+    return distances
+
+def kendall_tau(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    # Number of order pairs sequenced the other way round. With +-1 per pair (u before v or not),
+    # discordant pairs are (pairs - a . b) / 2, so the matrix is a sum of products over pair blocks.
+    a, b = positions(a), positions(b)
+    n = a.shape[1]
+    first, second = np.triu_indices(n, 1)
+    pairs = len(first)
+    products = np.zeros((len(a), len(b)))
+    step = max(1, BLOCK_ELEMENTS // max(1, len(a) + len(b)))
+    for k in range(0, pairs, step):
+        u, v = first[k:k + step], second[k:k + step]
+        signs_a = np.where(a[:, u] < a[:, v], 1.0, -1.0)
+        signs_b = np.where(b[:, u] < b[:, v], 1.0, -1.0)
+        products += signs_a @ signs_b.T
+    return np.rint((pairs - products) / 2).astype(np.int32)
+
+def banded_levenshtein(left: np.ndarray, right: np.ndarray, band: int) -> np.ndarray:
+    # Edit distance of the row pairs (left[k], right[k]) with the dynamic program restricted to
+    # |i - j| <= band. Distances up to band are exact, larger ones are upper bounds of at least band + 1.
+    # Column c of a band row is j = i + c - band, the pairs are the vectorized dimension. Insertions
+    # within a row, row[c] = min over k <= c of candidate[k] + c - k, are a running minimum.
+    pairs, n = left.shape
+    band = max(0, min(band, n))
+    width = 2 * band + 1
+    # Distances and order indices fit 16 bits for any realistic order count, half the memory traffic
+    dtype = np.int16 if 2 * n + 2 * width < np.iinfo(np.int16).max else np.int32
+    left = left.astype(dtype)
+    # right[:, j - 1] of a band row is the slice [i - 1, i - 1 + width) of right padded by band on both sides
+    padded = np.full((pairs, n + 2 * band), -1, dtype=dtype)
+    padded[:, band:band + n] = right
+    infinite = dtype(2 * n + 1)
+    offsets = (np.arange(width) - band).astype(dtype)
+    row = np.where((offsets >= 0) & (offsets <= n), offsets, infinite).astype(dtype)
+    row = np.broadcast_to(row, (pairs, width)).copy()
+    candidate = np.empty((pairs, width), dtype=dtype)
+    for i in range(1, n + 1):
+        j = i + offsets
+        # (i - 1, j - 1) is column c of the previous row, (i - 1, j) column c + 1
+        np.add(row, left[:, i - 1, None] != padded[:, i - 1:i - 1 + width], out=candidate, casting="unsafe")
+        np.minimum(candidate[:, :-1], row[:, 1:] + 1, out=candidate[:, :-1])
+        candidate[:, j == 0] = i
+        candidate[:, (j < 0) | (j > n)] = infinite
+        row = np.minimum.accumulate(candidate - offsets, axis=1) + offsets
+        row[:, j > n] = infinite
+    return row[:, band].astype(np.int32)
+
+def levenshtein(a: np.ndarray, b: np.ndarray, band: int = 8, offset: int = None) -> np.ndarray:
+    # Banded Levenshtein matrix. For a row block of a symmetric matrix (offset is the index of the
+    # first row of a within b) only the pairs above the diagonal are computed and the rest is left 0.
+    rows, columns = np.indices((len(a), len(b)))
+    if offset is not None:
+        upper = columns > rows + offset
+        rows, columns = rows[upper], columns[upper]
+    rows, columns = rows.ravel(), columns.ravel()
+    distances = np.zeros((len(a), len(b)), dtype=np.int32)
+    step = max(1, BLOCK_ELEMENTS // (2 * a.shape[1] + 2 * band + 1))
+    for k in range(0, len(rows), step):
+        r, c = rows[k:k + step], columns[k:k + step]
+        distances[r, c] = banded_levenshtein(a[r], b[c], band)
+    return distances
+
+
+METRICS = {"hamming": hamming, "kendall": kendall_tau, "position": position_deviation, "levenshtein": levenshtein}
+
+
+def block_task(task: tuple[str, np.ndarray, np.ndarray, int, int]) -> np.ndarray:
+    metric, a, b, band, offset = task
+    if metric == "levenshtein":
+        return levenshtein(a, b, band, offset)
+    return METRICS[metric](a, b)
+
+def distance_matrix(permutations: np.ndarray, metric: str = "hamming", other: np.ndarray = None, band: int = 8,
+                    workers: int = 0) -> np.ndarray:
+    # Distances between every row of permutations and every row of other (permutations itself if
+    # None), rows are order indices like the population matrix of optimizer.py. With workers > 1
+    # the rows are split into blocks over a process pool.
+    if metric not in METRICS:
+        raise ValueError(f"unknown metric {metric}, expected one of {', '.join(METRICS)}")
+    a = np.atleast_2d(np.asarray(permutations, dtype=np.intp))
+    symmetric = other is None
+    b = a if symmetric else np.atleast_2d(np.asarray(other, dtype=np.intp))
+    if a.shape[1] != b.shape[1]:
+        raise ValueError("sequences must be of equal length")
+    offsets = symmetric and metric == "levenshtein"
+    if workers and workers > 1 and len(a) > 1:
+        # Blocks of equal pair counts would favour the triangle, equal row counts are good enough
+        bounds = np.linspace(0, len(a), min(workers, len(a)) + 1).astype(int)
+        tasks = [(metric, a[start:end], b, band, start if offsets else None)
+                 for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+        with Pool(workers) as pool:
+            distances = np.concatenate(pool.map(block_task, tasks))
+    else:
+        distances = block_task((metric, a, b, band, 0 if offsets else None))
+    if offsets:
+        distances += distances.T
+    return distances
+
+
+def measures(permutations: np.ndarray, metric: str = "hamming", band: int = 8) -> np.ndarray:
+    # Distance of every individual to the first (best) one, the Measure column of results.csv
+    permutations = np.atleast_2d(permutations)
+    return distance_matrix(permutations, metric, permutations[:1], band)[:, 0]
+
+def mean_distance(distances: np.ndarray) -> float:
+    # Average distance between two different individuals of a symmetric matrix
+    population = len(distances)
+    return float(distances.sum() / (population * (population - 1))) if population > 1 else 0.0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the diversity matrices on random permutations.")
+    parser.add_argument("--population", type=int, default=500)
+    parser.add_argument("--orders", type=int, default=31)
+    parser.add_argument("--band", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=0, help=f"processes, {os.cpu_count()} cores available")
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+    population = np.argsort(rng.random((args.population, args.orders)), axis=1)
+    for metric in METRICS:
+        t = time.perf_counter()
+        distances = distance_matrix(population, metric, band=args.band, workers=args.workers)
+        print(f"{metric:12s} {(time.perf_counter() - t) * 1000:9.1f} ms  mean {mean_distance(distances):.2f}")
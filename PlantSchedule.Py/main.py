@@ -1,10 +1,14 @@
+import os
+import time
+from plantdata import csv_directory
 from simulator import *
 
-m1 = Resource("M1", 1.0, 0.5, 0.5)
-m2 = Resource("M2", 1.0)
+plant = Plant.from_csv(csv_directory)
+orders = plant.read_orders(os.path.join(csv_directory, "Order.csv"))
 
+t = time.perf_counter()
+schedule = plant.simulate(orders)
+elapsed = time.perf_counter() - t
 
-op = Operation([m1,m1],[],[],[])
-r1 = Recipe([op])
-
-o1 = Order(r1)
+print(f"{len(orders)} orders on {len(plant.resources)} resources in {elapsed * 1000:.2f} ms")
+print(f"Makespan: {schedule.makespan:.2f} h, {schedule.size} operations in {schedule.nbytes} bytes")
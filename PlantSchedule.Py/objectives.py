@@ -0,0 +1,88 @@
+import json
+import numpy as np
+
+# Objective variants of EvaluateObjectives in the reference simulator, columns of evaluate_objectives
+OBJECTIVES = ["Tardiness", "Lateness", "TotalAverageLateness", "AverageLateness", "WeightedLateness",
+              "AverageEarliness", "AverageTardiness", "TardinessAvgEarliness", "AverageTardinessAverageEarliness",
+              "TotalAvgTardiness", "TotalAvgEarliness", "TotalAvgEarlinessTotalAvgTardiness", "TardinessEarliness",
+              "Makespan", "AbsoluteMakespan"]
+COLUMNS = {name: column for column, name in enumerate(OBJECTIVES)}
+
+
+def evaluate_objectives(completion: np.ndarray, due_dates: np.ndarray, releases: np.ndarray = None) -> np.ndarray:
+    # All objectives for a batch of completion times [individual, order] in hours, one row per
+    # individual. Earliness is negative like in the reference, AbsoluteMakespan is measured from
+    # the earliest release.
+    completion = np.atleast_2d(completion)
+    population, n = completion.shape
+    lateness = completion - due_dates
+    tardy = lateness >= 0.0
+    early = ~tardy
+    tardy_count = tardy.sum(axis=1)
+    early_count = n - tardy_count
+    tardiness = np.where(tardy, lateness, 0.0).sum(axis=1)
+    earliness = np.where(early, lateness, 0.0).sum(axis=1)
+    average_tardiness = tardiness / n
+    average_earliness = earliness / n
+    total_avg_tardiness = np.divide(tardiness, tardy_count, out=np.zeros(population), where=tardy_count > 0)
+    total_avg_earliness = np.divide(earliness, early_count, out=np.zeros(population), where=early_count > 0)
+    # Kept as in the reference, including its mix of averages and counts
+    total_average_lateness = np.where(
+        early_count > 0,
+        np.where(tardy_count > 0,
+                 total_avg_earliness / np.maximum(tardy_count, 1) + early_count * total_avg_tardiness,
+                 total_avg_earliness + early_count * total_avg_tardiness),
+        total_avg_tardiness)
+    # Largest tardiness, or the smallest earliness if no order is late
+    tardiness_earliness = np.where(tardy_count > 0, np.where(tardy, lateness, -np.inf).max(axis=1),
+                                   np.where(early, lateness, -np.inf).max(axis=1))
+    makespan = completion.max(axis=1)
+    earliest_start = float(np.min(releases)) if releases is not None and len(releases) else 0.0
+
+    objectives = np.empty((population, len(OBJECTIVES)))
+    objectives[:, COLUMNS["Tardiness"]] = tardiness
+    objectives[:, COLUMNS["Lateness"]] = tardiness + earliness
+    objectives[:, COLUMNS["TotalAverageLateness"]] = total_average_lateness
+    objectives[:, COLUMNS["AverageLateness"]] = average_tardiness + average_earliness
+    objectives[:, COLUMNS["WeightedLateness"]] = tardiness + 0.1 * earliness
+    objectives[:, COLUMNS["AverageEarliness"]] = average_earliness
+    objectives[:, COLUMNS["AverageTardiness"]] = average_tardiness
+    objectives[:, COLUMNS["TardinessAvgEarliness"]] = np.where(tardiness > 0.0, tardiness, average_earliness)
+    objectives[:, COLUMNS["AverageTardinessAverageEarliness"]] = np.where(average_tardiness > 0.0, average_tardiness,
+                                                                           average_earliness)
+    objectives[:, COLUMNS["TotalAvgTardiness"]] = total_avg_tardiness
+    objectives[:, COLUMNS["TotalAvgEarliness"]] = total_avg_earliness
+    objectives[:, COLUMNS["TotalAvgEarlinessTotalAvgTardiness"]] = np.where(total_avg_tardiness > 0.0,
+                                                                             total_avg_tardiness, total_avg_earliness)
+    objectives[:, COLUMNS["TardinessEarliness"]] = tardiness_earliness
+    objectives[:, COLUMNS["Makespan"]] = makespan
+    objectives[:, COLUMNS["AbsoluteMakespan"]] = makespan - earliest_start
+    return objectives
+
+
+def configured_objective(path: str) -> str:
+    # Objective setting of config.json (UTF-16 like the C# configuration)
+    with open(path, encoding="utf-16") as file:
+        name = json.load(file)["Objective"]
+    if name not in COLUMNS:
+        raise ValueError(f"unknown objective {name}, expected one of {', '.join(OBJECTIVES)}")
+    return name
+
+
+# Objectives that do not decrease when any completion time grows, so lower bounds on the
+# completion times and the makespan give lower bounds on the objective
+BOUNDED_OBJECTIVES = ["Tardiness", "AverageTardiness", "Makespan", "AbsoluteMakespan"]
+
+
+def objective_bounds(completion: np.ndarray, makespan: np.ndarray, due_dates: np.ndarray, objective: str,
+                     releases: np.ndarray = None) -> np.ndarray:
+    # Lower bound of the objective per individual from completion [individual, order] and makespan
+    # lower bounds, see Plant.lower_bounds
+    if objective not in BOUNDED_OBJECTIVES:
+        raise ValueError(f"no lower bound for objective {objective}, expected one of {', '.join(BOUNDED_OBJECTIVES)}")
+    if objective in ("Makespan", "AbsoluteMakespan"):
+        earliest_start = float(np.min(releases)) if objective == "AbsoluteMakespan" and releases is not None \
+            and len(releases) else 0.0
+        return makespan - earliest_start
+    tardiness = np.maximum(np.atleast_2d(completion) - due_dates, 0.0).sum(axis=1)
+    return tardiness / completion.shape[-1] if objective == "AverageTardiness" else tardiness
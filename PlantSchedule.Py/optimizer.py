@@ -0,0 +1,266 @@
+import argparse
+import json
+import os
+import time
+from typing import Callable
+import numpy as np
+from objectives import BOUNDED_OBJECTIVES, configured_objective
+from plantdata import csv_directory
+from simulator import Order, Plant
+
+config_path = os.path.join(os.path.dirname(__file__), "..", "PlantSchedule.RTS", "config.json")
+
+# Settings of config.json used by the optimizer, with the values of the reference configuration
+SETTINGS = {"Objective": "AbsoluteMakespan", "ParentSelection": "RankSelection", "SurvivorSelection": "RandomSurvivor",
+            "ElitistSelection": "ElitismSelection", "MutationMethod": "PermutationMutation",
+            "InitializationMethod": "EmptyMutation", "CrossoverMethod": "CycleCrossover", "Generations": 1000,
+            "PopulationSize": 32, "ParentsSize": 32, "OffspringSize": 32, "ElitistSize": 32,
+            "MutationRate": 1.0, "CrossoverRate": 0.5}
+
+
+def read_settings(path: str) -> dict[str, object]:
+    # Optimizer settings of config.json (UTF-16 like the C# configuration), missing keys keep their defaults
+    with open(path, encoding="utf-16") as file:
+        config = json.load(file)
+    settings = {key: config.get(key, value) for key, value in SETTINGS.items()}
+    settings["Objective"] = configured_objective(path)
+    return settings
+
+
+# Operators work on a whole population matrix [individual, position] of order indices at once
+
+def rank_selection(fitness: np.ndarray, count: int, rng: np.random.Generator) -> np.ndarray:
+    # Best count individuals, sorted (RankSelection of the reference)
+    return np.argsort(fitness, kind="stable")[:count]
+
+def rank_based_selection(fitness: np.ndarray, count: int, rng: np.random.Generator) -> np.ndarray:
+    # count draws with probability proportional to the rank, the best individual has the largest rank.
+    # Deliberately the other way round than RankBasedSelection of the reference, which sorts by
+    # ascending fitness and weights position j with j + 1, so there the worst individual is favoured.
+    ranked = np.argsort(fitness, kind="stable")
+    weights = np.arange(len(fitness), 0, -1, dtype=np.float64)
+    return ranked[rng.choice(len(fitness), count, p=weights / weights.sum())]
+
+def random_selection(fitness: np.ndarray, count: int, rng: np.random.Generator) -> np.ndarray:
+    return rng.integers(0, len(fitness), count)
+
+def elitism_selection(fitness: np.ndarray, count: int, rng: np.random.Generator) -> np.ndarray:
+    return np.argsort(fitness, kind="stable")[:count]
+
+def random_survivor(fitness: np.ndarray, count: int, rng: np.random.Generator) -> np.ndarray:
+    return rng.permutation(len(fitness))[:count]
+
+
+def permutation_mutation(permutations: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    # Shuffles a random segment [start, end) of every row, start < n - 2 and end > start like the
+    # reference. Positions outside the segment keep their integer sort key, positions inside get a
+    # random key within [start, end), so one argsort shuffles all segments.
+    population, n = permutations.shape
+    if n < 3:
+        return permutations.copy()
+    start = rng.integers(0, n - 2, population)
+    end = rng.integers(start + 1, n)
+    positions = np.arange(n)
+    keys = np.broadcast_to(positions, (population, n)).astype(np.float64)
+    inside = (positions >= start[:, None]) & (positions < end[:, None])
+    keys[inside] = (start[:, None] + rng.random((population, n)) * (end - start)[:, None])[inside]
+    return np.take_along_axis(permutations, np.argsort(keys, axis=1), axis=1)
+
+def cycle_crossover(parents1: np.ndarray, parents2: np.ndarray,
+                    rng: np.random.Generator) -> tuple[np.ndarray, np.ndarray]:
+    # Cycles of position i -> position of parents2[i] in parents1, labeled by their smallest position
+    # with pointer doubling. Every second cycle (in order of the first position) is taken from the
+    # other parent.
+    population, n = parents1.shape
+    rows = np.arange(population)[:, None]
+    inverse = np.empty_like(parents1)
+    inverse[rows, parents1] = np.arange(n)
+    successor = inverse[rows, parents2]
+    label = np.broadcast_to(np.arange(n), (population, n)).copy()
+    for _ in range(max(1, int(np.ceil(np.log2(n)))) + 1):
+        label = np.minimum(label, label[rows, successor])
+        successor = successor[rows, successor]
+    leaders = np.cumsum(label == np.arange(n), axis=1) - 1
+    swap = (leaders[rows, label] % 2) == 1
+    return np.where(swap, parents2, parents1), np.where(swap, parents1, parents2)
+
+def pmx_child(parents1: np.ndarray, parents2: np.ndarray, first: np.ndarray, last: np.ndarray) -> np.ndarray:
+    # parents1 with the segment [first, last) of parents2, values outside the segment that are
+    # duplicated follow the mapping parents2[i] -> parents1[i] until they leave the segment
+    population, n = parents1.shape
+    rows = np.arange(population)[:, None]
+    segment = (np.arange(n) >= first[:, None]) & (np.arange(n) < last[:, None])
+    mapping = np.broadcast_to(np.arange(n), (population, n)).copy()
+    mapping[np.nonzero(segment)[0], parents2[segment]] = parents1[segment]
+    for _ in range(max(1, int(np.ceil(np.log2(n)))) + 1):
+        mapping = mapping[rows, mapping]
+    return np.where(segment, parents2, mapping[rows, parents1])
+
+def partially_mapped_crossover(parents1: np.ndarray, parents2: np.ndarray,
+                               rng: np.random.Generator) -> tuple[np.ndarray, np.ndarray]:
+    # Cut points first in [1, n - 1) and last in [first, n) like the reference
+    population, n = parents1.shape
+    first = rng.integers(1, max(2, n - 1), population)
+    last = rng.integers(first, n)
+    return pmx_child(parents1, parents2, first, last), pmx_child(parents2, parents1, first, last)
+
+
+PARENT_SELECTIONS = {"RankSelection": rank_selection, "RankBasedSelection": rank_based_selection,
+                     "RandomSelection": random_selection}
+ELITIST_SELECTIONS = {"ElitismSelection": elitism_selection}
+SURVIVOR_SELECTIONS = {"RandomSurvivor": random_survivor, "ElitismSelection": elitism_selection}
+CROSSOVERS = {"CycleCrossover": cycle_crossover, "PartiallyMappedCrossover": partially_mapped_crossover}
+MUTATIONS = {"PermutationMutation": permutation_mutation}
+
+
+class EvolutionaryAlgorithm:
+    # Generation loop of the reference EvolutionaryAlgorithm (select parents, recombine, mutate,
+    # evaluate, select survivors) on a population matrix. Every generation is evaluated in one call,
+    # by default the vectorized flow shop decoding of the plant (Plant.fitness). With screen, offspring
+    # whose lower bound (Plant.bounds, valid for that decoding) is worse than the worst individual of
+    # the population are not evaluated. That only leaves the result unchanged while survivors are
+    # chosen by fitness alone (elite covering the population or elitist survivor selection), otherwise
+    # a worse offspring could still be drawn, so screen is rejected for such settings. A custom evaluate
+    # (e.g. the event simulation) is not bounded by Plant.bounds, so it cannot be screened either.
+    plant: Plant
+    orders: list[Order]
+    settings: dict[str, object]
+    evaluate: Callable[[np.ndarray], np.ndarray]
+    rng: np.random.Generator
+    population: np.ndarray
+    fitness: np.ndarray
+    screen: bool
+    generation: int
+    evaluations: int
+    screened: int
+    history: list[tuple[float, float, float]]
+    def __init__(self, plant: Plant, orders: list[Order], settings: dict[str, object] = None,
+                 evaluate: Callable[[np.ndarray], np.ndarray] = None, seed: int = None, screen: bool = False) -> None:
+        self.plant = plant
+        self.orders = orders
+        self.settings = {**SETTINGS, **(settings or {})}
+        for key, methods in (("ParentSelection", PARENT_SELECTIONS), ("ElitistSelection", ELITIST_SELECTIONS),
+                             ("SurvivorSelection", SURVIVOR_SELECTIONS), ("CrossoverMethod", CROSSOVERS),
+                             ("MutationMethod", MUTATIONS)):
+            if self.settings[key] not in methods:
+                raise ValueError(f"unknown {key} {self.settings[key]}, expected one of {', '.join(methods)}")
+        objective = self.settings["Objective"]
+        if screen and objective not in BOUNDED_OBJECTIVES:
+            raise ValueError(f"no lower bound for objective {objective}, screening needs one of "
+                             f"{', '.join(BOUNDED_OBJECTIVES)}")
+        self.screen = screen
+        if screen and evaluate is not None:
+            raise ValueError("screening needs the default evaluation, Plant.bounds does not bound a custom evaluate")
+        if screen and not self.fitness_survival():
+            raise ValueError("screening needs ElitistSize >= PopulationSize or an elitist SurvivorSelection")
+        self.evaluate = evaluate or (lambda permutations: plant.fitness(permutations, orders, objective))
+        self.rng = np.random.default_rng(seed)
+        self.generation = self.evaluations = self.screened = 0
+        self.history = []
+        self.initialize()
+
+    @classmethod
+    def from_config(cls, plant: Plant, orders: list[Order], path: str = config_path, **kwargs) -> "EvolutionaryAlgorithm":
+        return cls(plant, orders, read_settings(path), **kwargs)
+
+    def fitness_survival(self) -> bool:
+        # True if the survivors are the best individuals of offspring and population
+        settings = self.settings
+        return settings["ElitistSize"] >= settings["PopulationSize"] or \
+            SURVIVOR_SELECTIONS[settings["SurvivorSelection"]] is elitism_selection
+
+    def initialize(self) -> None:
+        # EmptyMutation starts every individual from the order sequence, otherwise random permutations
+        size, n = self.settings["PopulationSize"], len(self.orders)
+        if self.settings["InitializationMethod"] == "EmptyMutation":
+            self.population = np.tile(np.arange(n), (size, 1))
+        else:
+            self.population = np.argsort(self.rng.random((size, n)), axis=1)
+        self.fitness = self.evaluate(self.population)
+        self.evaluations += size
+
+    def offspring(self) -> np.ndarray:
+        settings = self.settings
+        count = settings["OffspringSize"]
+        parents = PARENT_SELECTIONS[settings["ParentSelection"]](self.fitness, settings["ParentsSize"], self.rng)
+        # Consecutive parents are paired, cycling through them until there are enough pairs
+        pairs = parents[np.arange(2 * ((count + 1) // 2)) % len(parents)].reshape(-1, 2)
+        parents1, parents2 = self.population[pairs[:, 0]], self.population[pairs[:, 1]]
+        recombined = self.rng.random(len(pairs)) < settings["CrossoverRate"]
+        children1, children2 = parents1.copy(), parents2.copy()
+        if recombined.any():
+            children1[recombined], children2[recombined] = CROSSOVERS[settings["CrossoverMethod"]](
+                parents1[recombined], parents2[recombined], self.rng)
+        children = np.concatenate((children1, children2))[:count]
+        mutated = self.rng.random(count) < settings["MutationRate"]
+        if mutated.any():
+            children[mutated] = MUTATIONS[settings["MutationMethod"]](children[mutated], self.rng)
+        return children
+
+    def select_survivors(self, offspring: np.ndarray, fitness: np.ndarray) -> None:
+        # ElitistSize best of offspring and population, the rest of the population by SurvivorSelection
+        settings = self.settings
+        candidates = np.concatenate((offspring, self.population))
+        candidate_fitness = np.concatenate((fitness, self.fitness))
+        elite_size = min(settings["ElitistSize"], settings["PopulationSize"])
+        elite = ELITIST_SELECTIONS[settings["ElitistSelection"]](candidate_fitness, elite_size, self.rng)
+        selected = elite
+        if elite_size < settings["PopulationSize"]:
+            rest = np.setdiff1d(np.arange(len(candidates)), elite)
+            survivors = rest[SURVIVOR_SELECTIONS[settings["SurvivorSelection"]](
+                candidate_fitness[rest], settings["PopulationSize"] - elite_size, self.rng)]
+            selected = np.concatenate((elite, survivors))
+        selected = selected[np.argsort(candidate_fitness[selected], kind="stable")]
+        self.population, self.fitness = candidates[selected], candidate_fitness[selected]
+
+    def step(self) -> None:
+        offspring = self.offspring()
+        fitness = np.full(len(offspring), np.inf)
+        evaluated = np.ones(len(offspring), dtype=bool)
+        # Settings may have been changed since construction, screening pauses while it is not exact
+        if self.screen and self.fitness_survival():
+            bounds = self.plant.bounds(offspring, self.orders, self.settings["Objective"])
+            evaluated = bounds <= self.fitness.max()
+            self.screened += len(offspring) - int(evaluated.sum())
+        if evaluated.any():
+            fitness[evaluated] = self.evaluate(offspring[evaluated])
+            self.evaluations += int(evaluated.sum())
+        self.select_survivors(offspring, fitness)
+        self.generation += 1
+        self.history.append((float(self.fitness[0]), float(self.fitness.mean()), float(self.fitness.std())))
+
+    def run(self, generations: int = None,
+            callback: Callable[["EvolutionaryAlgorithm"], None] = None) -> tuple[np.ndarray, float]:
+        # Best permutation and its fitness after the configured (or given) number of generations
+        for _ in range(self.settings["Generations"] if generations is None else generations):
+            self.step()
+            if callback is not None:
+                callback(self)
+        best = int(np.argmin(self.fitness))
+        return self.population[best].copy(), float(self.fitness[best])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the evolutionary optimizer on a plant with the config.json settings.")
+    parser.add_argument("--csv", default=csv_directory, help="plant directory in the CsvFiles schema")
+    parser.add_argument("--config", default=config_path, help="config.json of the reference optimizer")
+    parser.add_argument("--generations", type=int, help="overrides Generations of the config")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--report", type=int, default=100, help="print every Nth generation")
+    parser.add_argument("--screen", action="store_true", help="skip offspring whose lower bound cannot survive")
+    args = parser.parse_args()
+    plant = Plant.from_csv(args.csv)
+    orders = plant.read_orders(os.path.join(args.csv, "Order.csv"))
+    algorithm = EvolutionaryAlgorithm.from_config(plant, orders, args.config, seed=args.seed, screen=args.screen)
+
+    def report(algorithm: EvolutionaryAlgorithm) -> None:
+        if algorithm.generation % args.report == 0:
+            best, mean, std = algorithm.history[-1]
+            print(f"Generation {algorithm.generation}: best {best:.2f}, mean {mean:.2f}, std {std:.2f}")
+
+    t = time.perf_counter()
+    permutation, fitness = algorithm.run(args.generations, report)
+    elapsed = time.perf_counter() - t
+    print(f"{algorithm.settings['Objective']} {fitness:.2f} after {algorithm.generation} generations "
+          f"({algorithm.evaluations} evaluations, {algorithm.screened} screened out) in {elapsed:.2f} s")
+    print("Sequence: " + " ".join(orders[i].name for i in permutation))
@@ -0,0 +1,102 @@
+import os
+import numpy as np
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
+from plantdata import Names, PlantData
+from simulator import Order, Plant
+
+
+def share(arrays: dict[str, np.ndarray]) -> tuple[list[SharedMemory], dict[str, tuple[str, tuple, str]]]:
+    # Copies the arrays into shared memory blocks once, the layout is what workers need to attach
+    memories = []
+    layout = {}
+    for key, array in arrays.items():
+        memory = SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, array.dtype, memory.buf)[...] = array
+        memories.append(memory)
+        layout[key] = (memory.name, array.shape, array.dtype.str)
+    return memories, layout
+
+def attach(layout: dict[str, tuple[str, tuple, str]]) -> tuple[list[SharedMemory], dict[str, np.ndarray]]:
+    memories = []
+    arrays = {}
+    for key, (name, shape, dtype) in layout.items():
+        memory = SharedMemory(name=name)
+        memories.append(memory)
+        arrays[key] = np.ndarray(shape, dtype, memory.buf)
+    return memories, arrays
+
+
+# Per worker process state, set once by init_worker
+plant: Plant = None
+orders: list[Order] = None
+memories: list[SharedMemory] = []
+
+def init_worker(layout: dict[str, tuple[str, tuple, str]], names: tuple[list[str], list[str], list[str]],
+                order_table: list[tuple[str, float, float]], maintenances: list[tuple[int, float, float]]) -> None:
+    global plant, orders, memories
+    memories, arrays = attach(layout)
+    products, machines, stages = names
+    data = PlantData(Names(products), Names(machines), Names(stages), arrays["process_times"],
+                     arrays["changeover_times"], arrays["stage_machines"])
+    plant = Plant(data, (arrays["eligible_indptr"], arrays["eligible_indices"]))
+    plant.maintenances = maintenances
+    orders = [plant.order(name, release, due_date) for name, release, due_date in order_table]
+
+def evaluate_permutations(plant: Plant, orders: list[Order], permutations: np.ndarray, simulate: bool) -> np.ndarray:
+    # Returns float64 [3, len(permutations)] with makespan, tardiness and earliness
+    if not simulate:
+        return np.stack(plant.evaluate_batch(permutations, orders))
+    _, _, due_dates = plant.order_arrays(orders)
+    results = np.empty((3, len(permutations)))
+    for i, permutation in enumerate(permutations):
+        schedule = plant.simulate([orders[j] for j in permutation])
+        lateness = schedule.completion - due_dates[permutation]
+        results[:, i] = (schedule.makespan, lateness[lateness >= 0.0].sum(), lateness[lateness < 0.0].sum())
+    return results
+
+def evaluate_chunk(task: tuple[np.ndarray, bool]) -> np.ndarray:
+    permutations, simulate = task
+    return evaluate_permutations(plant, orders, permutations, simulate)
+
+
+class ParallelEvaluator:
+    # Fans permutations out over a process pool, the plant tables and eligibility index are placed
+    # in shared memory once instead of being pickled with every task
+    workers: int
+    memories: list[SharedMemory]
+    pool: Pool
+    def __init__(self, plant: Plant, orders: list[Order], workers: int = None) -> None:
+        self.workers = workers or os.cpu_count()
+        data = plant.data
+        self.memories, layout = share({
+            "process_times": data.process_times,
+            "changeover_times": data.changeover_times,
+            "stage_machines": data.stage_machines,
+            "eligible_indptr": plant.eligible_indptr,
+            "eligible_indices": plant.eligible_indices})
+        names = (data.products.names, data.machines.names, data.stages.names)
+        order_table = [(order.name, order.release, order.due_date) for order in orders]
+        self.pool = Pool(self.workers, init_worker, (layout, names, order_table, plant.maintenances))
+
+    def evaluate(self, permutations: np.ndarray, simulate: bool = False) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # simulate=False uses the vectorized flow shop decoding, simulate=True the event simulation
+        # including maintenance windows. Results are returned in the order of the permutations.
+        permutations = np.atleast_2d(np.asarray(permutations, dtype=np.intp))
+        chunks = [chunk for chunk in np.array_split(permutations, self.workers) if len(chunk)]
+        results = np.concatenate(self.pool.map(evaluate_chunk, [(chunk, simulate) for chunk in chunks]), axis=1)
+        return results[0], results[1], results[2]
+
+    def close(self) -> None:
+        self.pool.terminate()
+        self.pool.join()
+        for memory in self.memories:
+            memory.close()
+            memory.unlink()
+        self.memories = []
+
+    def __enter__(self) -> "ParallelEvaluator":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,120 @@
+import csv
+import os
+import numpy as np
+
+# Plant of the reference simulator, the default instance of the command line tools
+csv_directory = os.path.join(os.path.dirname(__file__), "..", "PlantSchedule.RTS", "CsvFiles")
+
+
+class Names:
+    # Interned integer ids for resource, order, product and stage names
+    __slots__ = ("names", "ids")
+    names: list[str]
+    ids: dict[str, int]
+    def __init__(self, names: list[str] = ()) -> None:
+        self.names = []
+        self.ids = {}
+        for name in names:
+            self.intern(name)
+
+    def intern(self, name: str) -> int:
+        id = self.ids.get(name)
+        if id is None:
+            id = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return id
+
+    def __getitem__(self, id: int) -> str:
+        return self.names[id]
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+
+def read_csv(path: str) -> list[list[str]]:
+    with open(path, newline="", encoding="utf-8-sig") as file:
+        return [[value.strip() for value in row] for row in csv.reader(file) if row]
+
+
+class PlantData:
+    # Dense plant tables indexed by interned ids, all times in hours
+    CACHE = ".PlantData.npz"
+    products: Names
+    machines: Names
+    stages: Names
+    process_times: np.ndarray     # float32 [product, machine], 0 if not allocatable
+    changeover_times: np.ndarray  # float32 [stage, next product, previous product]
+    stage_machines: np.ndarray    # bool [stage, machine]
+    machine_stage: np.ndarray     # int16 [machine]
+    def __init__(self, products: Names, machines: Names, stages: Names, process_times: np.ndarray,
+                 changeover_times: np.ndarray, stage_machines: np.ndarray) -> None:
+        self.products = products
+        self.machines = machines
+        self.stages = stages
+        self.process_times = process_times
+        self.changeover_times = changeover_times
+        self.stage_machines = stage_machines
+        self.machine_stage = np.argmax(stage_machines, axis=0).astype(np.int16)
+
+    @staticmethod
+    def sources(directory: str) -> list[str]:
+        files = ["StageMachineMap.csv", "ProcessTimes.csv"]
+        files += sorted(file for file in os.listdir(directory) if file.startswith("ChangeoverTimes_"))
+        return [os.path.join(directory, file) for file in files]
+
+    @classmethod
+    def from_csv(cls, directory: str) -> "PlantData":
+        rows = read_csv(os.path.join(directory, "StageMachineMap.csv"))
+        stages = Names(rows[0][1:])
+        machines = Names(row[0] for row in rows[1:])
+        stage_machines = np.array([[flag == "1" for flag in row[1:]] for row in rows[1:]], dtype=bool).T
+
+        rows = read_csv(os.path.join(directory, "ProcessTimes.csv"))
+        products = Names(row[0] for row in rows[1:])
+        columns = [machines.ids[machine] for machine in rows[0][1:]]
+        process_times = np.zeros((len(products), len(machines)), dtype=np.float32)
+        process_times[:, columns] = np.array([row[1:] for row in rows[1:]], dtype=np.float32)
+
+        # Rows and columns are matched by product name, missing matrices mean no changeover
+        changeover_times = np.zeros((len(stages), len(products), len(products)), dtype=np.float32)
+        for stage, name in enumerate(stages.names):
+            path = os.path.join(directory, f"ChangeoverTimes_{name}.csv")
+            if not os.path.exists(path):
+                continue
+            rows = read_csv(path)
+            columns = [products.ids[product] for product in rows[0][1:]]
+            for row in rows[1:]:
+                changeover_times[stage, products.ids[row[0]], columns] = np.array(row[1:], dtype=np.float32)
+        return cls(products, machines, stages, process_times, changeover_times, stage_machines)
+
+    @classmethod
+    def load(cls, directory: str, cache: bool = True) -> "PlantData":
+        # The cache is valid as long as the names, sizes and mtimes of the source files match
+        if not cache:
+            return cls.from_csv(directory)
+        key = np.array([f"{os.path.basename(path)}:{os.stat(path).st_size}:{os.stat(path).st_mtime_ns}"
+                        for path in cls.sources(directory)])
+        path = os.path.join(directory, cls.CACHE)
+        try:
+            with np.load(path) as npz:
+                if np.array_equal(npz["key"], key):
+                    return cls(Names(npz["products"].tolist()), Names(npz["machines"].tolist()),
+                               Names(npz["stages"].tolist()), npz["process_times"],
+                               npz["changeover_times"], npz["stage_machines"])
+        except (OSError, KeyError, ValueError):
+            pass
+        data = cls.from_csv(directory)
+        try:
+            data.save(path, key)
+        except OSError:
+            pass
+        return data
+
+    def save(self, path: str, key: np.ndarray) -> None:
+        # Written to a temporary file first so concurrent runs never read a partial cache
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as file:
+            np.savez(file, key=key, products=np.array(self.products.names), machines=np.array(self.machines.names),
+                     stages=np.array(self.stages.names), process_times=self.process_times,
+                     changeover_times=self.changeover_times, stage_machines=self.stage_machines)
+        os.replace(temporary, path)
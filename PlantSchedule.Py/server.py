@@ -0,0 +1,211 @@
+import argparse
+import asyncio
+import json
+import os
+import numpy as np
+from parallel import ParallelEvaluator, evaluate_permutations
+from plantdata import csv_directory
+from simulator import Order, Plant
+
+
+class EvaluationServer:
+    # Local evaluation service over TCP or a Unix socket, one JSON object per line in each direction:
+    #   {"id": 1, "permutations": [[3, 0, 2, ...], ...], "simulate": false}
+    #   {"id": 1, "makespan": [...], "tardiness": [...], "earliness": [...]}
+    # ("permutation" with a single order sequence is accepted as well, errors come back as
+    # {"id": 1, "error": "..."}). Requests of all clients arriving within `window` seconds are
+    # evaluated as one batch on the worker pool, each client gets its rows back as soon as the
+    # batch is done, in completion order.
+    plant: Plant
+    orders: list[Order]
+    window: float
+    max_batch: int
+    max_pending: int
+    evaluator: ParallelEvaluator
+    pending: asyncio.Queue
+    batches: int
+    requests: int
+    def __init__(self, plant: Plant, orders: list[Order], window: float = 0.002, max_batch: int = 4096,
+                 workers: int = 0, max_pending: int = 10000) -> None:
+        self.plant = plant
+        self.orders = orders
+        self.window = window
+        self.max_batch = max_batch
+        # Without workers the batches run in one thread next to the event loop
+        self.evaluator = ParallelEvaluator(plant, orders, workers) if workers else None
+        self.max_pending = max_pending
+        self.pending = None
+        self.batches = self.requests = 0
+
+    def evaluate(self, permutations: np.ndarray, simulate: bool) -> np.ndarray:
+        if self.evaluator is not None:
+            return np.stack(self.evaluator.evaluate(permutations, simulate))
+        return evaluate_permutations(self.plant, self.orders, permutations, simulate)
+
+    async def batcher(self) -> None:
+        # Collects requests for one window (or max_batch rows), evaluates them and resolves their futures
+        loop = asyncio.get_running_loop()
+        while True:
+            requests = [await self.pending.get()]
+            rows = len(requests[0][0])
+            deadline = loop.time() + self.window
+            while rows < self.max_batch:
+                try:
+                    request = await asyncio.wait_for(self.pending.get(), deadline - loop.time())
+                except asyncio.TimeoutError:
+                    break
+                requests.append(request)
+                rows += len(request[0])
+            for simulate in (False, True):
+                group = [request for request in requests if request[1] == simulate]
+                if not group:
+                    continue
+                permutations = np.concatenate([permutations for permutations, _, _ in group])
+                try:
+                    results = await loop.run_in_executor(None, self.evaluate, permutations, simulate)
+                except Exception as e:
+                    for _, _, future in group:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+                self.batches += 1
+                offset = 0
+                for permutations, _, future in group:
+                    if not future.done():
+                        future.set_result(results[:, offset:offset + len(permutations)])
+                    offset += len(permutations)
+
+    def parse(self, request: dict) -> np.ndarray:
+        permutations = request.get("permutations")
+        if permutations is None:
+            if "permutation" not in request:
+                raise ValueError("request needs 'permutations' or 'permutation'")
+            permutations = [request["permutation"]]
+        permutations = np.atleast_2d(np.asarray(permutations, dtype=np.intp))
+        n = len(self.orders)
+        if permutations.shape[1] != n or not np.all(np.sort(permutations, axis=1) == np.arange(n)):
+            raise ValueError(f"permutations of the {n} orders expected")
+        return permutations
+
+    async def respond(self, request: dict, writer: asyncio.StreamWriter) -> None:
+        id = request.get("id")
+        try:
+            future = asyncio.get_running_loop().create_future()
+            await self.pending.put((self.parse(request), bool(request.get("simulate", False)), future))
+            makespan, tardiness, earliness = (await future).tolist()
+            response = {"id": id, "makespan": makespan, "tardiness": tardiness, "earliness": earliness}
+        except Exception as e:
+            response = {"id": id, "error": str(e)}
+        if not writer.is_closing():
+            writer.write(json.dumps(response).encode() + b"\n")
+            await writer.drain()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        tasks = set()
+        try:
+            while line := await reader.readline():
+                self.requests += 1
+                try:
+                    request = json.loads(line)
+                except json.JSONDecodeError as e:
+                    writer.write(json.dumps({"id": None, "error": f"invalid JSON: {e}"}).encode() + b"\n")
+                    continue
+                if not isinstance(request, dict):
+                    writer.write(json.dumps({"id": None, "error": "request must be a JSON object"}).encode() + b"\n")
+                    continue
+                task = asyncio.create_task(self.respond(request, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            await asyncio.gather(*tasks)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8765, path: str = None) -> None:
+        # Serves until cancelled, on the Unix socket path if one is given
+        self.pending = asyncio.Queue(self.max_pending)
+        batcher = asyncio.create_task(self.batcher())
+        if path:
+            server = await asyncio.start_unix_server(self.handle, path, limit=2 ** 24)
+        else:
+            server = await asyncio.start_server(self.handle, host, port, limit=2 ** 24)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+            self.close()
+            if path and os.path.exists(path):
+                os.unlink(path)
+
+    def close(self) -> None:
+        if self.evaluator is not None:
+            self.evaluator.close()
+            self.evaluator = None
+
+
+class EvaluationClient:
+    # Client of EvaluationServer, several evaluate() calls may be awaited concurrently on one connection
+    reader: asyncio.StreamReader
+    writer: asyncio.StreamWriter
+    futures: dict[int, asyncio.Future]
+    next_id: int
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.reader = reader
+        self.writer = writer
+        self.futures = {}
+        self.next_id = 0
+        self.receiver = asyncio.create_task(self.receive())
+
+    @classmethod
+    async def connect(cls, host: str = "127.0.0.1", port: int = 8765, path: str = None) -> "EvaluationClient":
+        if path:
+            return cls(*await asyncio.open_unix_connection(path, limit=2 ** 24))
+        return cls(*await asyncio.open_connection(host, port, limit=2 ** 24))
+
+    async def receive(self) -> None:
+        while line := await self.reader.readline():
+            response = json.loads(line)
+            future = self.futures.pop(response["id"], None)
+            if future is None or future.done():
+                continue
+            if "error" in response:
+                future.set_exception(RuntimeError(response["error"]))
+            else:
+                future.set_result((np.array(response["makespan"]), np.array(response["tardiness"]),
+                                   np.array(response["earliness"])))
+
+    async def evaluate(self, permutations: np.ndarray,
+                       simulate: bool = False) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        id = self.next_id
+        self.next_id += 1
+        future = self.futures[id] = asyncio.get_running_loop().create_future()
+        request = {"id": id, "permutations": np.atleast_2d(permutations).tolist(), "simulate": simulate}
+        self.writer.write(json.dumps(request).encode() + b"\n")
+        await self.writer.drain()
+        return await future
+
+    async def close(self) -> None:
+        self.receiver.cancel()
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve batched schedule evaluations of a plant.")
+    parser.add_argument("--csv", default=csv_directory, help="plant directory in the CsvFiles schema")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="Unix socket path instead of TCP")
+    parser.add_argument("--workers", type=int, default=0, help="worker processes, 0 evaluates in a thread")
+    parser.add_argument("--window", type=float, default=2.0, help="batching window in milliseconds")
+    args = parser.parse_args()
+    plant = Plant.from_csv(args.csv)
+    orders = plant.read_orders(os.path.join(args.csv, "Order.csv"))
+    server = EvaluationServer(plant, orders, args.window / 1000, workers=args.workers)
+    print(f"Serving {len(orders)} orders on {args.unix or f'{args.host}:{args.port}'}")
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
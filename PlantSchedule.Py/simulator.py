@@ -1,13 +1,166 @@
+import bisect
+import cProfile
+import csv
+import heapq
+import json
+import pstats
+from time import perf_counter
 import numpy as np
 from enum import Enum
-class Plant:
-    pass
+from objectives import COLUMNS, evaluate_objectives, objective_bounds
+from plantdata import Names, PlantData
+
+
+OPERATION_DTYPE = np.dtype([("order", np.int32), ("machine", np.int16), ("op", np.int8),
+                            ("start", np.float64), ("end", np.float64)])
+
+class Schedule:
+    # Columnar store of all operations of one simulation, 23 bytes per operation
+    __slots__ = ("rows", "size", "orders", "machines", "completion")
+    rows: np.ndarray
+    size: int
+    orders: Names
+    machines: Names
+    completion: np.ndarray
+    def __init__(self, orders: Names, machines: Names, capacity: int = 64) -> None:
+        self.rows = np.empty(capacity, dtype=OPERATION_DTYPE)
+        self.size = 0
+        self.orders = orders
+        self.machines = machines
+        self.completion = np.full(len(orders), np.nan)
+
+    def append(self, order: int, machine: int, op: int, start: float, end: float) -> None:
+        if self.size == len(self.rows):
+            self.rows = np.resize(self.rows, 2 * len(self.rows))
+        self.rows[self.size] = (order, machine, op, start, end)
+        self.size += 1
+
+    def extend(self, rows: np.ndarray) -> None:
+        if self.size + len(rows) > len(self.rows):
+            self.rows = np.resize(self.rows, 2 * (self.size + len(rows)))
+        self.rows[self.size:self.size + len(rows)] = rows
+        self.size += len(rows)
+
+    def trim(self) -> None:
+        self.rows = self.rows[:self.size].copy()
+
+    @property
+    def operations(self) -> np.ndarray:
+        return self.rows[:self.size]
+
+    @property
+    def makespan(self) -> float:
+        return float(np.nanmax(self.completion)) if len(self.completion) else 0.0
+
+    @property
+    def nbytes(self) -> int:
+        return self.rows.nbytes + self.completion.nbytes
+
+    def machine_operations(self, machine: int) -> np.ndarray:
+        operations = self.operations
+        return operations[operations["machine"] == machine]
+
+    def order_operations(self, order: int) -> np.ndarray:
+        operations = self.operations
+        return operations[operations["order"] == order]
+
+    def completions(self) -> dict[str, float]:
+        return dict(zip(self.orders.names, self.completion.tolist()))
+
 
 class Resource:
+    # View of one machine, operations are read from the schedule of the last simulation. The free
+    # time is a sorted list of disjoint gaps between booked operations and maintenance windows, the
+    # last gap is open ended and starts at `available`. A gap ends at the process start of the
+    # operation following it, so that operation's changeover can be redone from an inserted product.
+    __slots__ = ("name", "id", "stage", "changeovers", "available", "last", "gap_ends", "gaps", "schedule")
     name: str
-    def __init__(self, name: str) -> None:
+    id: int
+    stage: int
+    changeovers: list[list[float]]  # changeover times of the stage [next product][previous product]
+    available: float
+    last: int
+    gap_ends: list[float]           # sorted ends of the gaps for bisect
+    gaps: list[tuple[float, float, int, int, int, int]]  # (start, end, previous product, next product,
+                                                         #  next order, schedule row of the next setup)
+    schedule: Schedule
+    def __init__(self, name: str, stage: int = -1, id: int = -1, changeovers: list[list[float]] = None) -> None:
         self.name = name
-        
+        self.stage = stage
+        self.id = id
+        self.changeovers = changeovers
+        self.reset()
+
+    def reset(self, schedule: Schedule = None) -> None:
+        self.available = 0.0
+        self.last = -1
+        self.gap_ends = [float("inf")]
+        self.gaps = [(0.0, float("inf"), -1, -1, -1, -1)]
+        self.schedule = schedule
+
+    def replace_gaps(self, first: int, last: int, gaps: list[tuple[float, float, int, int, int, int]]) -> None:
+        gaps = [gap for gap in gaps if gap[0] < gap[1]]
+        self.gaps[first:last] = gaps
+        self.gap_ends[first:last] = [gap[1] for gap in gaps]
+        self.available, self.last = self.gaps[-1][0], self.gaps[-1][2]
+
+    def block(self, start: float, end: float) -> None:
+        # Maintenance window, cut out of the free time. The machine starts without a changeover after it.
+        first = bisect.bisect_right(self.gap_ends, start)
+        last = first
+        while last < len(self.gaps) and self.gaps[last][0] < end:
+            last += 1
+        if first == last:
+            return
+        before, after = self.gaps[first], self.gaps[last - 1]
+        self.replace_gaps(first, last, [(before[0], start, before[2], -1, -1, -1),
+                                        (end, after[1], -1, *after[3:])])
+
+    def trim(self, now: float) -> None:
+        # Free time before now is gone, the product set up on the machine is kept
+        first = bisect.bisect_right(self.gap_ends, now)
+        if first < len(self.gaps) and self.gaps[first][0] < now:
+            self.replace_gaps(first, first + 1, [(now, *self.gaps[first][1:])])
+        self.replace_gaps(0, first, [])
+
+    def earliest_fit(self, time: float, product: int, duration: float) -> tuple[int, float, float]:
+        # First gap ending after time that holds changeover + process, plus the changeover of the
+        # next operation from product. Returns (gap, setup, process start), the open gap always fits.
+        changeovers = self.changeovers
+        for gap in range(bisect.bisect_right(self.gap_ends, time), len(self.gaps)):
+            gap_start, gap_end, previous, next, _, _ = self.gaps[gap]
+            setup = changeovers[product][previous] if previous >= 0 else 0.0
+            start = max(gap_start + setup, time)
+            if start + duration + (changeovers[next][product] if next >= 0 else 0.0) <= gap_end:
+                return gap, setup, start
+        raise ValueError(f"no gap on {self.name} after {time}")
+
+    def book(self, gap: int, order: int, product: int, setup: float, start: float, end: float) -> None:
+        # Changeover and process of order in the gap found by earliest_fit, the setup of the
+        # following operation is redone from product
+        gap_start, gap_end, previous, next, next_order, next_setup = self.gaps[gap]
+        schedule = self.schedule
+        setup_row = -1
+        if setup > 0.0:
+            setup_row = schedule.size
+            schedule.append(order, self.id, OperationType.SETUP.value, start - setup, start)
+        schedule.append(order, self.id, OperationType.PROC.value, start, end)
+        if next >= 0:
+            follow = self.changeovers[next][product]
+            if next_setup >= 0:
+                schedule.rows[next_setup]["start"] = gap_end - follow
+            elif follow > 0.0:
+                next_setup = schedule.size
+                schedule.append(next_order, self.id, OperationType.SETUP.value, gap_end - follow, gap_end)
+        self.replace_gaps(gap, gap + 1, [(gap_start, start, previous, product, order, setup_row),
+                                         (end, gap_end, product, next, next_order, next_setup)])
+
+    @property
+    def operations(self) -> np.ndarray:
+        if self.schedule is None:
+            return np.empty(0, dtype=OPERATION_DTYPE)
+        return self.schedule.machine_operations(self.id)
+
 class Utility:
     name: str
     def __init__(self, name: str) -> None:
@@ -29,9 +182,12 @@ class OperationType(Enum):
     CLEAN = 2
     SETUP = 3
     END = 4
+    MAINTENANCE = 5
 
 class Operation:
+    __slots__ = ("stage", "resources", "utilities", "staff", "materials", "duration", "clean", "setup", "amount")
     OperationType: OperationType
+    stage: int
     resources: list[str]
     utilities: list[str]
     staff: list[str]
@@ -40,44 +196,666 @@ class Operation:
     clean: float
     setup: float
     amount: int
-    def __init__(self, resources: list[str], utilities: list[str], staff: list[str], materials: list[str]) -> None:
+    def __init__(self, resources: list[str], utilities: list[str], staff: list[str], materials: list[str], stage: int = -1) -> None:
         self.resources = resources
         self.utilities = utilities
         self.staff = staff
         self.materials = materials
+        self.stage = stage
 
 class Wait(Operation):
+    __slots__ = ()
     OperationType = OperationType.WAIT
-    def __init__(self, duration: dict[str, float]) -> None:
+    def __init__(self, duration: dict[str, float], stage: int = -1) -> None:
+        super().__init__([], [], [], [], stage)
         self.duration = duration
 
 class Proc(Operation):
+    __slots__ = ()
     OperationType = OperationType.PROC
-    def __init__(self, duration: dict[str, float], amount: int) -> None:
+    def __init__(self, duration: dict[str, float], amount: int, stage: int = -1) -> None:
+        super().__init__(list(duration), [], [], [], stage)
         self.duration = duration
         self.amount = amount
 
 class Clean(Operation):
+    __slots__ = ()
     OperationType = OperationType.CLEAN
-    def __init__(self, clean: float) -> None:
-        self.clean = clean  
+    def __init__(self, clean: float, stage: int = -1) -> None:
+        super().__init__([], [], [], [], stage)
+        self.clean = clean
 
 class Setup(Operation):
+    __slots__ = ()
     OperationType = OperationType.SETUP
-    def __init__(self, setup: float) -> None:
+    # setup is only a default, the changeover depends on the previous product of the resource
+    def __init__(self, setup: float, stage: int = -1) -> None:
+        super().__init__([], [], [], [], stage)
         self.setup = setup
 
 class End(Operation):
-    pass
+    __slots__ = ()
+    OperationType = OperationType.END
+    def __init__(self) -> None:
+        super().__init__([], [], [], [])
 
 
 class Recipe:
+    __slots__ = ("states", "transitions", "current_state")
     states: list[Operation]
     transitions: dict[Operation, Operation]
     current_state: Operation
-    
+    def __init__(self, states: list[Operation]) -> None:
+        self.states = states
+        self.transitions = dict(zip(states, states[1:]))
+        self.current_state = states[0]
+
+    def step(self) -> Operation:
+        self.current_state = self.transitions[self.current_state]
+        return self.current_state
+
+    def copy(self) -> "Recipe":
+        # States and transitions are shared, only the current state belongs to the copy
+        return Recipe(self.states)
+
 
 class Order:
+    __slots__ = ("recipe", "name", "product", "release", "due_date", "resource", "end", "completion")
     recipe: Recipe
-    def __init__(self, recipe: Recipe) -> None:
-        self.recipe = recipe
\ No newline at end of file
+    name: str
+    product: str
+    release: float
+    due_date: float
+    resource: Resource
+    end: float
+    completion: float
+    def __init__(self, recipe: Recipe, name: str = "", release: float = 0.0, due_date: float = 0.0) -> None:
+        self.recipe = recipe
+        self.name = name
+        self.product = name.split("_")[0]
+        self.release = release
+        self.due_date = due_date
+        self.resource = None
+        self.end = release
+        self.completion = float("nan")
+
+
+class Maintenance:
+    # Maintenance window announced during a run, see Plant.apply_event
+    __slots__ = ("machine", "start", "duration")
+    machine: str
+    start: float
+    duration: float
+    def __init__(self, machine: str, start: float, duration: float) -> None:
+        self.machine = machine
+        self.start = start
+        self.duration = duration
+
+
+class Checkpoint:
+    # Machine availability and last product before every position of a dispatched permutation
+    __slots__ = ("permutation", "states", "completion")
+    permutation: list[int]
+    states: list[tuple[tuple[float, ...], tuple[int, ...]]]
+    completion: list[float]
+    def __init__(self, permutation: list[int], states: list[tuple[tuple[float, ...], tuple[int, ...]]],
+                 completion: list[float]) -> None:
+        self.permutation = permutation
+        self.states = states
+        self.completion = completion
+
+    def shared_prefix(self, permutation: list[int]) -> int:
+        if len(permutation) != len(self.permutation):
+            return 0
+        for position, (order, other) in enumerate(zip(permutation, self.permutation)):
+            if order != other:
+                return position
+        return len(permutation)
+
+
+class Plant:
+    # All times are hours relative to the simulation start
+    data: PlantData
+    stages: dict[str, list[str]]
+    machines: Names
+    resources: dict[str, Resource]
+    resource_ids: list[Resource]
+    stage_resources: list[list[Resource]]
+    process_times: list[list[float]]
+    changeover_times: list[list[list[float]]]
+    eligible_indptr: np.ndarray   # int32 [stage * products + product + 1], CSR row pointers
+    eligible_indices: np.ndarray  # int16 machine ids of all (stage, product) rows
+    in_service: np.ndarray        # bool [machine]
+    eligible: list[list[list[Resource]]]
+    maintenances: list[tuple[int, float, float]]
+    recipes: dict[str, Recipe]
+    orders: list[Order]  # orders and schedule of the last simulation, the plan apply_event changes
+    schedule: Schedule
+    now: float           # operations started before now are frozen
+    events: int          # events processed by the last simulation
+    def __init__(self, data: PlantData, eligibility: tuple[np.ndarray, np.ndarray] = None) -> None:
+        self.data = data
+        self.machines = data.machines
+        self.stages = {stage: [data.machines[machine] for machine in np.flatnonzero(data.stage_machines[id])]
+                       for id, stage in enumerate(data.stages.names)}
+        # Nested lists for the scalar event loop, indexing them is cheaper than numpy scalars
+        self.process_times = data.process_times.tolist()
+        self.changeover_times = data.changeover_times.tolist()
+        self.resources = {machine: Resource(machine, int(data.machine_stage[id]), id,
+                                            self.changeover_times[data.machine_stage[id]])
+                          for id, machine in enumerate(data.machines.names)}
+        self.resource_ids = list(self.resources.values())
+        self.stage_resources = [[self.resources[machine] for machine in machines] for machines in self.stages.values()]
+        self.maintenances = []
+        self.orders, self.schedule, self.now = [], None, 0.0
+        self.events = 0
+        self.build_eligibility(eligibility)
+        self.recipes = {product: self.build_recipe(id) for id, product in enumerate(data.products.names)}
+
+    @classmethod
+    def from_csv(cls, directory: str, cache: bool = True) -> "Plant":
+        return cls(PlantData.load(directory, cache))
+
+    def build_eligibility(self, eligibility: tuple[np.ndarray, np.ndarray] = None) -> None:
+        # CSR index eligible[stage][product] -> machines with a process time > 0, built once
+        # unless an index (e.g. from shared memory) is passed in
+        if eligibility is None:
+            stage_machines = self.data.stage_machines[:, None, :] & (self.data.process_times > 0.0)[None, :, :]
+            counts = stage_machines.sum(axis=2).ravel()
+            eligibility = (np.concatenate(([0], np.cumsum(counts))).astype(np.int32),
+                           np.nonzero(stage_machines.reshape(len(counts), -1))[1].astype(np.int16))
+        self.eligible_indptr, self.eligible_indices = eligibility
+        self.in_service = np.ones(len(self.machines), dtype=bool)
+        products = len(self.data.products)
+        self.eligible = [[self.eligible_row(stage, product) for product in range(products)]
+                         for stage in range(len(self.stages))]
+
+    def eligible_row(self, stage: int, product: int) -> list[Resource]:
+        row = stage * len(self.data.products) + product
+        machines = self.eligible_indices[self.eligible_indptr[row]:self.eligible_indptr[row + 1]]
+        return [self.resource_ids[machine] for machine in machines[self.in_service[machines]].tolist()]
+
+    def set_in_service(self, machine: int, in_service: bool) -> None:
+        # Only the rows of the products the machine can process are rebuilt
+        if self.in_service[machine] == in_service:
+            return
+        self.in_service[machine] = in_service
+        stage = int(self.data.machine_stage[machine])
+        for product in np.flatnonzero(self.data.process_times[:, machine] > 0.0):
+            self.eligible[stage][product] = self.eligible_row(stage, product)
+
+    def take_out(self, machine: str) -> None:
+        self.set_in_service(self.machines.ids[machine], False)
+
+    def restore(self, machine: str) -> None:
+        self.set_in_service(self.machines.ids[machine], True)
+
+    def add_maintenance(self, machine: str, start: float, duration: float) -> None:
+        self.maintenances.append((self.machines.ids[machine], start, start + duration))
+        self.maintenances.sort(key=lambda maintenance: maintenance[1])
+
+    def read_maintenances(self, path: str, time_increment: float) -> None:
+        # Maintenance.csv gives the start in generations of time_increment seconds and the duration
+        # in seconds, like the Maintenances of config.json
+        with open(path, newline="", encoding="utf-8-sig") as file:
+            for row in list(csv.reader(file))[1:]:
+                if row:
+                    self.add_maintenance(row[0].strip(), float(row[1]) * time_increment / 3600, float(row[2]) / 3600)
+
+    def allocatable(self, product: int, stage: int) -> list[Resource]:
+        return self.eligible[stage][product]
+
+    def build_recipe(self, product: int) -> Recipe:
+        # Wait -> Setup -> Proc for every stage the product is processed on, stages without
+        # an allocatable machine are skipped as in FindNextStage of the reference simulator
+        states = []
+        for stage in range(len(self.stages)):
+            resources = self.allocatable(product, stage)
+            if not resources:
+                continue
+            duration = {resource.name: self.process_times[product][resource.id] for resource in resources}
+            states += [Wait({}, stage), Setup(0.0, stage), Proc(duration, 1, stage)]
+        states.append(End())
+        return Recipe(states)
+
+    def changeover(self, resource: Resource, product: int) -> float:
+        if resource.last < 0:
+            return 0.0
+        # Indexed by (next, previous) product like the reference simulator
+        return self.changeover_times[resource.stage][product][resource.last]
+
+    def order(self, name: str, release: float = 0.0, due_date: float = 0.0) -> Order:
+        return Order(self.recipes[name.split("_")[0]].copy(), name, release, due_date)
+
+    def read_orders(self, path: str) -> list[Order]:
+        # Order.csv lists products, repeated products get an increasing suffix (P20_00, P20_01)
+        with open(path, newline="", encoding="utf-8-sig") as file:
+            products = [row[0].strip() for row in list(csv.reader(file))[1:] if row]
+        counts = {}
+        orders = []
+        for product in products:
+            counts[product] = counts.get(product, -1) + 1
+            orders.append(self.order(f"{product}_{counts[product]:02d}"))
+        return orders
+
+    def allocate(self, product: int, stage: int, time: float) -> tuple[Resource, int, float, float, float]:
+        # Earliest end over the allocatable resources, gaps before already booked operations are
+        # used if the order fits, the changeover is done right before the process.
+        # Returns (resource, gap, setup, start, end).
+        best = (None, -1, 0.0, 0.0, float("inf"))
+        process_times = self.process_times[product]
+        for resource in self.allocatable(product, stage):
+            duration = process_times[resource.id]
+            gap, setup, start = resource.earliest_fit(time, product, duration)
+            end = start + duration
+            if end < best[4]:
+                best = (resource, gap, setup, start, end)
+        return best
+
+    def simulate(self, orders: list[Order], frozen: np.ndarray = None, now: float = 0.0) -> Schedule:
+        # Orders are prioritised by their position, the queue holds (time, priority, order) with
+        # one pending event per order, so every event costs O(log n). Maintenance windows are
+        # events with a negative priority and take their machine out of the eligibility index.
+        # Frozen operations (schedule rows, order ids into orders) are kept as they are and only
+        # the remaining stages are simulated from now on, see apply_event.
+        schedule = Schedule(Names([order.name for order in orders]), self.machines,
+                            sum(2 * len(order.recipe.states) // 3 for order in orders) + len(self.maintenances) + 1)
+        for resource in self.resources.values():
+            resource.reset(schedule)
+        products = [self.data.products.ids[order.product] for order in orders]
+        done = [0] * len(orders)
+        resume = [order.release for order in orders]
+        if frozen is not None:
+            # Frozen rows are copied as they are. Gaps between them end before now, so only the
+            # open gap after the last frozen process of each machine is left.
+            schedule.extend(frozen)
+            process = np.sort(frozen[frozen["op"] == OperationType.PROC.value], order="end", kind="stable")
+            for order, machine, _, _, end in process.tolist():
+                done[order] += 1
+                resume[order] = end
+                self.resource_ids[machine].replace_gaps(0, 1, [(end, float("inf"), products[order], -1, -1, -1)])
+        queue = []
+        for priority, order in enumerate(orders):
+            order.recipe.current_state = order.recipe.states[3 * done[priority]]
+            order.resource, order.end = None, resume[priority]
+            if order.recipe.current_state.OperationType is OperationType.END and done[priority]:
+                order.completion = schedule.completion[priority] = resume[priority]
+                continue
+            queue.append((max(resume[priority], now), priority, order))
+        for index, (machine, start, end) in enumerate(self.maintenances):
+            self.resource_ids[machine].block(start, end)
+            schedule.append(-1, machine, OperationType.MAINTENANCE.value, start, end)
+            if end > now:
+                queue.append((max(start, now), -2 * index - 2, machine))
+                queue.append((end, -2 * index - 1, machine))
+        if now > 0.0:
+            for resource in self.resource_ids:
+                resource.trim(now)
+        heapq.heapify(queue)
+        blocked = []
+        events = 0
+        while queue:
+            time, priority, order = heapq.heappop(queue)
+            events += 1
+            if priority < 0:
+                # Even priorities start a maintenance window, odd ones end it
+                self.set_in_service(order, priority % 2 == 1)
+                if priority % 2 == 1:
+                    for event in blocked:
+                        heapq.heappush(queue, (time, *event))
+                    blocked = []
+                continue
+            state = order.recipe.current_state
+            kind = state.OperationType
+            if kind is OperationType.WAIT:
+                product = products[priority]
+                resource, gap, setup, start, end = self.allocate(product, state.stage, time)
+                if resource is None:
+                    # Every allocatable machine is in maintenance, wait for the next one to return
+                    blocked.append((priority, order))
+                    continue
+                resource.book(gap, priority, product, setup, start, end)
+                order.resource, order.end = resource, end
+                order.recipe.step()
+                heapq.heappush(queue, (start, priority, order))
+            elif kind is OperationType.SETUP:
+                order.recipe.step()
+                heapq.heappush(queue, (order.end, priority, order))
+            elif kind is OperationType.PROC:
+                order.recipe.step()
+                heapq.heappush(queue, (time, priority, order))
+            else:
+                order.completion = time
+                schedule.completion[priority] = time
+        schedule.trim()
+        self.orders, self.schedule, self.now = orders, schedule, now
+        self.events = events
+        return schedule
+
+    def advance_to(self, time: float) -> None:
+        # Moves the rolling horizon, operations starting before time can no longer be changed
+        self.now = max(self.now, time)
+
+    def frozen_operations(self) -> np.ndarray:
+        # Setup and process rows of the last schedule that started before now, a process whose
+        # changeover already started is frozen as well
+        operations = self.schedule.operations
+        operations = operations[operations["order"] >= 0]
+        setup = operations["op"] == OperationType.SETUP.value
+        started = {(order, end) for order, end in operations[setup & (operations["start"] < self.now)][["order", "end"]].tolist()}
+        process = operations[~setup]
+        process = process[(process["start"] < self.now) |
+                          np.array([key in started for key in process[["order", "start"]].tolist()], dtype=bool)]
+        keys = set(process[["order", "start"]].tolist())
+        setups = operations[setup]
+        setups = setups[np.array([key in keys for key in setups[["order", "end"]].tolist()], dtype=bool)]
+        return np.concatenate((process, setups))
+
+    def apply_event(self, event: "Order | Maintenance", priority: int = 0) -> Schedule:
+        # Rush order (inserted at priority) or maintenance window arriving at now. Operations that
+        # started are frozen with the machines' set up products, only the other stages are simulated again.
+        frozen = self.frozen_operations()
+        orders = self.orders
+        if isinstance(event, Maintenance):
+            # An operation running on the machine is finished before the window starts
+            machine = self.machines.ids[event.machine]
+            start = max(event.start, self.now)
+            running = frozen[(frozen["machine"] == machine) & (frozen["end"] > start)]
+            start = max(start, running["end"].max(initial=start))
+            self.add_maintenance(event.machine, start, event.duration)
+        else:
+            event.release = max(event.release, self.now)
+            orders = orders[:priority] + [event] + orders[priority:]
+        # Order ids of the frozen rows follow the new order list
+        positions = {order.name: i for i, order in enumerate(orders)}
+        frozen["order"] = np.array([positions[name] for name in self.schedule.orders.names])[frozen["order"]]
+        return self.simulate(orders, frozen, self.now)
+
+    def order_arrays(self, orders: list[Order]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        products = np.array([self.data.products.ids[order.product] for order in orders], dtype=np.intp)
+        releases = np.array([order.release for order in orders], dtype=np.float64)
+        due_dates = np.array([order.due_date for order in orders], dtype=np.float64)
+        return products, releases, due_dates
+
+    def batch_completion(self, permutations: np.ndarray, orders: list[Order]) -> np.ndarray:
+        # Permutation flow shop: every individual dispatches its orders in sequence through all
+        # stages on the machine with the earliest end. One step per (position, stage) is done for
+        # the whole population at once. Maintenance windows are not considered.
+        permutations = np.atleast_2d(permutations)
+        population, n = permutations.shape
+        products, releases, _ = self.order_arrays(orders)
+        process_times = self.data.process_times.astype(np.float64)
+        # A zero column for "no previous product", last == -1 indexes it
+        changeover_times = np.pad(self.data.changeover_times.astype(np.float64), ((0, 0), (0, 0), (0, 1)))
+        stage_machines = [np.flatnonzero(machines) for machines in self.data.stage_machines]
+        available = np.zeros((population, len(self.machines)))
+        last = np.full((population, len(self.machines)), -1, dtype=np.intp)
+        completion = np.empty((population, n))
+        rows = np.arange(population)
+        for position in range(n):
+            order = permutations[:, position]
+            product = products[order]
+            time = releases[order]
+            for stage, machines in enumerate(stage_machines):
+                durations = process_times[product[:, None], machines]
+                eligible = durations > 0.0
+                allocatable = eligible.any(axis=1)
+                if not allocatable.any():
+                    continue
+                setup = changeover_times[stage, product[:, None], last[:, machines]]
+                end = np.maximum(available[:, machines] + setup, time[:, None]) + durations
+                end[~eligible] = np.inf
+                best = np.argmin(end, axis=1)
+                machine = machines[best][allocatable]
+                end = end[rows, best][allocatable]
+                available[rows[allocatable], machine] = end
+                last[rows[allocatable], machine] = product[allocatable]
+                time[allocatable] = end
+            completion[rows, order] = time
+        return completion
+
+    def evaluate(self, permutation: list[int], orders: list[Order],
+                 checkpoint: Checkpoint = None) -> tuple[np.ndarray, Checkpoint]:
+        # Scalar version of batch_completion that keeps the machine state before every position.
+        # With the checkpoint of an earlier permutation only the suffix after the shared prefix is
+        # dispatched again, e.g. from the first swapped position of a mutation.
+        permutation = [int(order) for order in permutation]
+        first = checkpoint.shared_prefix(permutation) if checkpoint is not None else 0
+        if first > 0:
+            states = checkpoint.states[:first + 1]
+            completion = list(checkpoint.completion)
+        else:
+            states = [((0.0,) * len(self.machines), (-1,) * len(self.machines))]
+            completion = [0.0] * len(permutation)
+        available, last = map(list, states[first])
+        products = self.data.products.ids
+        for position in range(first, len(permutation)):
+            order = orders[permutation[position]]
+            product = products[order.product]
+            process_times = self.process_times[product]
+            time = order.release
+            for stage, eligible in enumerate(self.eligible):
+                best, best_end = -1, float("inf")
+                for resource in eligible[product]:
+                    machine = resource.id
+                    setup = self.changeover_times[stage][product][last[machine]] if last[machine] >= 0 else 0.0
+                    end = max(available[machine] + setup, time) + process_times[machine]
+                    if end < best_end:
+                        best, best_end = machine, end
+                if best >= 0:
+                    available[best], last[best], time = best_end, product, best_end
+            completion[permutation[position]] = time
+            states.append((tuple(available), tuple(last)))
+        return np.array(completion), Checkpoint(permutation, states, completion)
+
+    def evaluate_batch(self, permutations: np.ndarray, orders: list[Order]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # Makespan, tardiness and (negative) earliness per individual in hours, as in EvaluateObjectives
+        completion = self.batch_completion(permutations, orders)
+        _, _, due_dates = self.order_arrays(orders)
+        lateness = completion - due_dates
+        tardiness = np.where(lateness >= 0.0, lateness, 0.0).sum(axis=1)
+        earliness = np.where(lateness < 0.0, lateness, 0.0).sum(axis=1)
+        return completion.max(axis=1), tardiness, earliness
+
+    def evaluate_objectives(self, permutations: np.ndarray, orders: list[Order]) -> np.ndarray:
+        # Every objective of EvaluateObjectives per individual, columns follow objectives.OBJECTIVES
+        _, releases, due_dates = self.order_arrays(orders)
+        return evaluate_objectives(self.batch_completion(permutations, orders), due_dates, releases)
+
+    def fitness(self, permutations: np.ndarray, orders: list[Order], objective: str = "Makespan") -> np.ndarray:
+        # Fitness column of the configured objective (config.json "Objective")
+        return self.evaluate_objectives(permutations, orders)[:, COLUMNS[objective]]
+
+    def lower_bounds(self, permutations: np.ndarray, orders: list[Order]) -> tuple[np.ndarray, np.ndarray]:
+        # Lower bounds of batch_completion: completion [individual, order] and makespan [individual],
+        # from the stage minima of the process times, a few array passes per stage instead of a
+        # dispatch step per (position, stage). An order that has a single eligible machine in a stage
+        # reaches it in sequence after the earlier orders bound to that machine, with at least the
+        # changeover between them or another order (>= the shortest process time of the machine)
+        # in between. Other orders are bounded by their arrival plus the fastest eligible machine.
+        permutations = np.atleast_2d(permutations)
+        population, n = permutations.shape
+        rows = np.arange(population)[:, None]
+        products, releases, _ = self.order_arrays(orders)
+        process_times = self.data.process_times.astype(np.float64)
+        changeover_times = self.data.changeover_times.astype(np.float64)
+        positive = np.where(process_times > 0.0, process_times, np.inf)
+        shortest = positive.min(axis=0)
+        sequence = products[permutations]
+        time = releases[permutations]
+        stage_minima = []
+        for stage, machines in enumerate(self.data.stage_machines):
+            machines = np.flatnonzero(machines)
+            eligible = process_times[:, machines] > 0.0
+            minimum = np.where(eligible.any(axis=1), positive[:, machines].min(axis=1), 0.0)
+            stage_minima.append(minimum)
+            # Machine the product is bound to in this stage, len(machines) if none or several
+            bound = np.where(eligible.sum(axis=1) == 1, eligible.argmax(axis=1), len(machines))
+            end = time + minimum[sequence]
+            machine = bound[sequence]
+            dedicated = machine < len(machines)
+            if dedicated.any():
+                # Group the orders by machine keeping the sequence, then a max-plus scan per group:
+                # end_k = max(end_k-1 + gap_k, arrival_k) + duration_k
+                #       = T_k + max over i <= k of (arrival_i + duration_i - T_i), T = cumulative gap + duration
+                order = np.argsort(machine, axis=1, kind="stable")
+                group = machine[rows, order]
+                product = sequence[rows, order]
+                arrival = time[rows, order]
+                duration = minimum[product]
+                same = np.zeros_like(dedicated)
+                same[:, 1:] = (group[:, 1:] == group[:, :-1]) & (group[:, 1:] < len(machines))
+                gap = np.zeros((population, n))
+                previous = np.roll(product, 1, axis=1)
+                gap[same] = np.minimum(changeover_times[stage, product, previous][same],
+                                       shortest[machines[np.minimum(group, len(machines) - 1)]][same])
+                total = np.cumsum(gap + duration, axis=1)
+                first = ~same
+                offset = np.maximum.accumulate(np.where(first, np.arange(n), 0), axis=1)
+                start_total = np.take_along_axis(total - gap - duration, offset, axis=1)
+                total -= start_total
+                candidate = arrival + duration - total
+                # Segmented running maximum: lift every group above all earlier ones
+                segment = np.cumsum(first, axis=1)
+                lift = np.ptp(candidate) + 1.0
+                candidate = np.maximum.accumulate(candidate + segment * lift, axis=1) - segment * lift
+                scanned = np.empty((population, n))
+                scanned[rows, order] = total + candidate
+                end = np.where(dedicated, scanned, end)
+            time = np.where(minimum[sequence] > 0.0, end, time)
+        completion = np.empty((population, n))
+        completion[rows, permutations] = time
+        # Stage loads: the fastest machines of a stage need at least the average of the minimal work,
+        # after the earliest arrival, and the last order needs at least the shortest remaining path
+        stage_minima = np.array(stage_minima)[:, products]
+        heads = releases + np.cumsum(stage_minima, axis=0) - stage_minima
+        tails = stage_minima[::-1].cumsum(axis=0)[::-1] - stage_minima
+        # Every product in a stage is changed over to at least once, except on the first order of each machine
+        other_products = changeover_times + np.diag(np.full(len(process_times), np.inf))
+        load = 0.0
+        for stage, machines in enumerate(self.data.stage_machines):
+            visits = stage_minima[stage] > 0.0
+            if visits.any():
+                machines = machines.sum()
+                changeovers = np.sort(other_products[stage].min(axis=1)[np.unique(products[visits])])
+                changeovers = np.where(np.isfinite(changeovers), changeovers, 0.0)[:max(0, len(changeovers) - machines)]
+                work = stage_minima[stage].sum() + changeovers.sum()
+                load = max(load, heads[stage][visits].min() + work / machines + tails[stage][visits].min())
+        return completion, np.maximum(completion.max(axis=1), load)
+
+    def bounds(self, permutations: np.ndarray, orders: list[Order], objective: str = "Makespan") -> np.ndarray:
+        # Lower bound of fitness() per individual, see objectives.BOUNDED_OBJECTIVES
+        _, releases, due_dates = self.order_arrays(orders)
+        completion, makespan = self.lower_bounds(permutations, orders)
+        return objective_bounds(completion, makespan, due_dates, objective, releases)
+
+
+class Instrumentation:
+    # Opt-in counters and timings of the simulator hot paths. enable() replaces the instrumented
+    # methods with timed wrappers and disable() puts the originals back, so nothing is measured
+    # (and nothing costs) while it is off. Timings are inclusive, allocate contains earliest_fit and
+    # apply_event its simulate. Worker processes (parallel.py) keep their own counters.
+    METHODS = [(Plant, "simulate"), (Plant, "apply_event"), (Plant, "allocate"), (Resource, "earliest_fit"),
+               (Plant, "evaluate"), (Plant, "evaluate_batch"), (Plant, "evaluate_objectives"),
+               (Plant, "batch_completion")]
+    enabled: bool
+    calls: dict[str, int]
+    seconds: dict[str, float]
+    counters: dict[str, int]
+    originals: dict[str, object]
+    def __init__(self) -> None:
+        self.enabled = False
+        self.originals = {}
+        self.reset()
+
+    def reset(self) -> None:
+        self.calls = {name: 0 for _, name in self.METHODS}
+        self.seconds = {name: 0.0 for _, name in self.METHODS}
+        self.counters = {"events": 0, "allocation_queries": 0, "gap_scans": 0, "evaluations": 0}
+
+    def enable(self) -> None:
+        if self.enabled:
+            return
+        for cls, name in self.METHODS:
+            self.originals[name] = getattr(cls, name)
+            setattr(cls, name, self.timed(name, self.originals[name]))
+        self.enabled = True
+
+    def disable(self) -> None:
+        for cls, name in self.METHODS:
+            if name in self.originals:
+                setattr(cls, name, self.originals.pop(name))
+        self.enabled = False
+
+    def timed(self, name: str, method):
+        counters = self.counters
+        def wrapper(owner, *args, **kwargs):
+            start = perf_counter()
+            result = method(owner, *args, **kwargs)
+            self.seconds[name] += perf_counter() - start
+            self.calls[name] += 1
+            if name == "earliest_fit":
+                # Gaps looked at after the bisect, 1 if the first candidate fits
+                at = args[0] if args else kwargs["time"]
+                counters["gap_scans"] += result[0] - bisect.bisect_right(owner.gap_ends, at) + 1
+            elif name == "allocate":
+                counters["allocation_queries"] += 1
+            elif name == "simulate":
+                counters["events"] += owner.events
+                counters["evaluations"] += 1
+            elif name == "evaluate":
+                counters["evaluations"] += 1
+            elif name in ("evaluate_batch", "evaluate_objectives"):
+                counters["evaluations"] += len(np.atleast_2d(args[0] if args else kwargs["permutations"]))
+            return result
+        wrapper.__wrapped__ = method
+        return wrapper
+
+    def snapshot(self, cache=None) -> dict[str, object]:
+        # Counters, calls and seconds per phase. Objective time is evaluate_batch and evaluate_objectives
+        # without their batch_completion, cache hit counts are taken from a FitnessCache if one is passed.
+        evaluation_seconds = (self.seconds["simulate"] + self.seconds["evaluate"] + self.seconds["evaluate_batch"]
+                              + self.seconds["evaluate_objectives"])
+        counters = dict(self.counters)
+        if cache is not None:
+            counters.update({f"cache_{key}": value for key, value in cache.stats().items()})
+        return {"counters": counters, "calls": dict(self.calls), "seconds": dict(self.seconds),
+                "objective_seconds": self.seconds["evaluate_batch"] + self.seconds["evaluate_objectives"]
+                                     - self.seconds["batch_completion"],
+                "evaluations_per_second": counters["evaluations"] / evaluation_seconds if evaluation_seconds else 0.0}
+
+    def to_json(self, cache=None) -> str:
+        return json.dumps(self.snapshot(cache), indent=2)
+
+    def to_prometheus(self, cache=None, prefix: str = "plantschedule") -> str:
+        # Prometheus text exposition format
+        snapshot = self.snapshot(cache)
+        lines = [f"# TYPE {prefix}_calls_total counter"]
+        lines += [f'{prefix}_calls_total{{phase="{name}"}} {value}' for name, value in snapshot["calls"].items()]
+        lines.append(f"# TYPE {prefix}_seconds_total counter")
+        lines += [f'{prefix}_seconds_total{{phase="{name}"}} {value:.9f}' for name, value in snapshot["seconds"].items()]
+        for name, value in snapshot["counters"].items():
+            kind = "gauge" if name in ("cache_size", "cache_capacity") else "counter"
+            metric = f"{prefix}_{name}" if kind == "gauge" else f"{prefix}_{name}_total"
+            lines += [f"# TYPE {metric} {kind}", f"{metric} {value}"]
+        lines += [f"# TYPE {prefix}_objective_seconds_total counter",
+                  f"{prefix}_objective_seconds_total {snapshot['objective_seconds']:.9f}",
+                  f"# TYPE {prefix}_evaluations_per_second gauge",
+                  f"{prefix}_evaluations_per_second {snapshot['evaluations_per_second']:.3f}"]
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def profile(function, *args, path: str = None, **kwargs) -> object:
+        # One call (e.g. plant.simulate) under cProfile. The dump at path opens in pstats, snakeviz
+        # or flameprof for a flame graph, a path ending in .txt gets the sorted text report instead.
+        profiler = cProfile.Profile()
+        result = profiler.runcall(function, *args, **kwargs)
+        if path is not None and path.endswith(".txt"):
+            with open(path, "w") as file:
+                pstats.Stats(profiler, stream=file).sort_stats("cumulative").print_stats()
+        elif path is not None:
+            profiler.dump_stats(path)
+        return result
+
+
+instrumentation = Instrumentation()
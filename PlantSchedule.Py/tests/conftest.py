@@ -0,0 +1,31 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+# The modules of PlantSchedule.Py import each other by their flat names
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from benchmark import write_instance
+from plantdata import csv_directory
+from simulator import Order, Plant
+
+
+@pytest.fixture(scope="session")
+def instances(tmp_path_factory: pytest.TempPathFactory) -> dict[str, str]:
+    # The reference CsvFiles and a small random plant with more machines per stage
+    return {"csvfiles": csv_directory,
+            "random": write_instance(str(tmp_path_factory.mktemp("instance")), 12, 4, 3, 40, seed=1)}
+
+
+@pytest.fixture(params=["csvfiles", "random"])
+def plant_orders(request: pytest.FixtureRequest, instances: dict[str, str]) -> tuple[Plant, list[Order]]:
+    # A fresh plant per test (maintenances and events change it), orders released at random times
+    # within the first hours so that machines are idle in between and later orders get inserted
+    directory = instances[request.param]
+    plant = Plant.from_csv(directory, cache=False)
+    orders = plant.read_orders(os.path.join(directory, "Order.csv"))
+    rng = np.random.default_rng(0)
+    for order in orders:
+        order.release = float(rng.uniform(0.0, 10.0))
+    return plant, orders
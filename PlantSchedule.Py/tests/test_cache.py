@@ -0,0 +1,46 @@
+import os
+import numpy as np
+import pytest
+from cache import FitnessCache
+from objectives import OBJECTIVES
+from simulator import Order, Plant
+
+
+@pytest.fixture
+def population(plant_orders: tuple[Plant, list[Order]]) -> np.ndarray:
+    _, orders = plant_orders
+    rng = np.random.default_rng(8)
+    permutations = np.array([rng.permutation(len(orders)) for _ in range(40)])
+    # Repeats within the batch are hits of the first copy
+    return np.concatenate((permutations, permutations[:5]))
+
+
+def test_cached_values_match_plant(plant_orders: tuple[Plant, list[Order]], population: np.ndarray) -> None:
+    plant, orders = plant_orders
+    cache = FitnessCache(plant, orders)
+    for _ in range(2):
+        for cached, evaluated in zip(cache.evaluate_batch(population), plant.evaluate_batch(population, orders)):
+            assert np.array_equal(cached, evaluated)
+        for objective in OBJECTIVES:
+            assert np.array_equal(cache.fitness(population, objective), plant.fitness(population, orders, objective))
+    assert cache.stats()["misses"] == 40
+    with pytest.raises(ValueError):
+        cache.fitness(population, "Nervousness")
+
+
+def test_save_and_load(plant_orders: tuple[Plant, list[Order]], population: np.ndarray, tmp_path) -> None:
+    plant, orders = plant_orders
+    cache = FitnessCache(plant, orders)
+    cache.evaluate_batch(population)
+    with pytest.raises(ValueError):
+        cache.save()
+    path = str(tmp_path / "cache.npz")
+    cache.save(path)
+    assert os.listdir(tmp_path) == ["cache.npz"]
+    loaded = FitnessCache(plant, orders, path=path)
+    assert loaded.entries == cache.entries
+    loaded.fitness(population)
+    assert loaded.stats()["misses"] == 0
+    # Another instance (here other due dates) ignores the file
+    orders[0].due_date += 1.0
+    assert not FitnessCache(plant, orders, path=path).entries
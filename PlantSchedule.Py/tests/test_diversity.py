@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+from diversity import METRICS, distance_matrix, measures
+
+
+def levenshtein_reference(a: list[int], b: list[int]) -> int:
+    # Full edit distance dynamic program, one row at a time
+    row = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        diagonal, row[0] = row[0], i
+        for j in range(1, len(b) + 1):
+            diagonal, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, diagonal + (a[i - 1] != b[j - 1]))
+    return row[-1]
+
+
+def sample(orders: int, seed: int = 0) -> np.ndarray:
+    # Random permutations and swap mutants of them, close pairs for the Levenshtein band
+    rng = np.random.default_rng(seed)
+    permutations = np.argsort(rng.random((8, orders)), axis=1)
+    mutants = permutations.copy()
+    for mutant in mutants:
+        i, j = rng.choice(orders, 2)
+        mutant[[i, j]] = mutant[[j, i]]
+    return np.concatenate((permutations, mutants))
+
+
+@pytest.mark.parametrize("orders", [1, 2, 7, 31, 120])
+def test_matrices_match_pairwise_definitions(orders: int) -> None:
+    permutations = sample(orders)
+    position = np.argsort(permutations, axis=1)
+    first, second = np.triu_indices(orders, 1)
+    before = position[:, first] < position[:, second]
+    matrices = {metric: distance_matrix(permutations, metric) for metric in ("hamming", "position", "kendall")}
+    for x in range(len(permutations)):
+        for y in range(len(permutations)):
+            assert matrices["hamming"][x, y] == (permutations[x] != permutations[y]).sum()
+            assert matrices["position"][x, y] == np.abs(position[x] - position[y]).sum()
+            assert matrices["kendall"][x, y] == (before[x] != before[y]).sum()
+    for metric, matrix in matrices.items():
+        assert np.array_equal(measures(permutations, metric), matrix[:, 0])
+
+
+@pytest.mark.parametrize("orders", [1, 7, 31])
+@pytest.mark.parametrize("band", [0, 1, 3, 8])
+def test_banded_levenshtein(orders: int, band: int) -> None:
+    # Exact within the band, an upper bound of more than band beyond it
+    permutations = sample(orders)
+    distances = distance_matrix(permutations, "levenshtein", band=band)
+    assert np.array_equal(distances, distances.T)
+    for x in range(len(permutations)):
+        for y in range(len(permutations)):
+            distance = levenshtein_reference(permutations[x].tolist(), permutations[y].tolist())
+            if distance <= band:
+                assert distances[x, y] == distance
+            else:
+                assert distances[x, y] >= distance > band
+
+
+@pytest.mark.parametrize("metric", list(METRICS))
+def test_blocks_and_workers_give_the_same_matrix(metric: str) -> None:
+    permutations = sample(31, seed=1)
+    distances = distance_matrix(permutations, metric)
+    assert np.array_equal(distance_matrix(permutations, metric, workers=2), distances)
+    assert np.array_equal(distance_matrix(permutations[:5], metric, permutations), distances[:5])
+
+
+def test_unknown_metric() -> None:
+    with pytest.raises(ValueError):
+        distance_matrix(sample(7), "jaro")
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+from objectives import OBJECTIVES, evaluate_objectives
+from simulator import Order, Plant
+
+
+def reference_objectives(completion: np.ndarray, due_dates: np.ndarray, earliest_start: float) -> dict[str, float]:
+    # Loop of EvaluateObjectives (EvalAllOrders branch) for the completion times of one individual
+    tardiness = makespan = absolute_makespan = earliness = 0.0
+    tardiness_list, earliness_list = [], []
+    for end, due_date in zip(completion.tolist(), due_dates.tolist()):
+        time_span = end - due_date
+        if time_span >= 0.0:
+            tardiness += time_span
+            tardiness_list.append(time_span)
+        if time_span < 0.0:
+            earliness += time_span
+            earliness_list.append(time_span)
+        if end > makespan:
+            makespan = end
+            absolute_makespan = end - earliest_start
+    count = len(completion)
+    average_earliness = earliness / count
+    average_tardiness = tardiness / count
+    total_avg_tardiness = sum(tardiness_list) / len(tardiness_list) if tardiness_list else 0.0
+    total_avg_earliness = sum(earliness_list) / len(earliness_list) if earliness_list else 0.0
+    if earliness_list:
+        if tardiness_list:
+            total_average_lateness = total_avg_earliness / len(tardiness_list) + len(earliness_list) * total_avg_tardiness
+        else:
+            total_average_lateness = total_avg_earliness + len(earliness_list) * total_avg_tardiness
+    else:
+        total_average_lateness = total_avg_tardiness
+    return {"Tardiness": tardiness,
+            "Lateness": tardiness + earliness,
+            "TotalAverageLateness": total_average_lateness,
+            "AverageLateness": average_tardiness + average_earliness,
+            "WeightedLateness": tardiness + 0.1 * earliness,
+            "AverageEarliness": average_earliness,
+            "AverageTardiness": average_tardiness,
+            "TardinessAvgEarliness": tardiness if tardiness > 0.0 else average_earliness,
+            "AverageTardinessAverageEarliness": average_tardiness if average_tardiness > 0.0 else average_earliness,
+            "TotalAvgTardiness": total_avg_tardiness,
+            "TotalAvgEarliness": total_avg_earliness,
+            "TotalAvgEarlinessTotalAvgTardiness": total_avg_tardiness if total_avg_tardiness > 0.0 else total_avg_earliness,
+            "TardinessEarliness": max(tardiness_list) if tardiness_list else max(earliness_list),
+            "Makespan": makespan,
+            "AbsoluteMakespan": absolute_makespan}
+
+
+@pytest.fixture
+def population_completion(plant_orders: tuple[Plant, list[Order]]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    plant, orders = plant_orders
+    rng = np.random.default_rng(5)
+    permutations = np.array([rng.permutation(len(orders)) for _ in range(32)])
+    _, releases, due_dates = plant.order_arrays(orders)
+    return plant.batch_completion(permutations, orders), releases, due_dates
+
+
+@pytest.mark.parametrize("due", ["orders", "early", "late", "mixed"])
+def test_objectives_match_reference_loop(population_completion: tuple[np.ndarray, np.ndarray, np.ndarray],
+                                         due: str) -> None:
+    # Due dates of the orders, and ones that make every order early, every order late, or each
+    # order late in about half of the individuals
+    completion, releases, due_dates = population_completion
+    due_dates = {"orders": due_dates, "early": np.full_like(due_dates, completion.max() + 1.0),
+                 "late": np.full_like(due_dates, completion.min() - 1.0),
+                 "mixed": np.median(completion, axis=0)}[due]
+    objectives = evaluate_objectives(completion, due_dates, releases)
+    for row, times in zip(objectives, completion):
+        reference = reference_objectives(times, due_dates, float(releases.min()))
+        assert row == pytest.approx([reference[name] for name in OBJECTIVES])
+
@@ -0,0 +1,51 @@
+import asyncio
+import json
+import numpy as np
+import pytest
+from parallel import evaluate_permutations
+from server import EvaluationClient, EvaluationServer
+from simulator import Order, Plant
+
+
+def test_parse_rejects_bad_requests(plant_orders: tuple[Plant, list[Order]]) -> None:
+    plant, orders = plant_orders
+    server = EvaluationServer(plant, orders)
+    with pytest.raises(ValueError, match="needs 'permutations' or 'permutation'"):
+        server.parse({"id": 1})
+    with pytest.raises(ValueError, match="permutations of the"):
+        server.parse({"id": 1, "permutation": [0, 0]})
+    assert server.parse({"permutation": list(range(len(orders)))}).shape == (1, len(orders))
+
+
+def test_requests_over_a_socket(plant_orders: tuple[Plant, list[Order]], tmp_path) -> None:
+    plant, orders = plant_orders
+    rng = np.random.default_rng(9)
+    permutations = np.array([rng.permutation(len(orders)) for _ in range(6)])
+    path = str(tmp_path / "server.sock")
+
+    async def session() -> tuple[list, list[dict]]:
+        server = EvaluationServer(plant, orders)
+        serving = asyncio.create_task(server.serve(path=path))
+        while not (tmp_path / "server.sock").exists():
+            await asyncio.sleep(0.01)
+        client = await EvaluationClient.connect(path=path)
+        results = await asyncio.gather(*(client.evaluate(permutations[i:i + 2]) for i in range(0, 6, 2)))
+        await client.close()
+        # Malformed requests are answered with an error each, the connection stays usable
+        reader, writer = await asyncio.open_unix_connection(path)
+        errors = []
+        for line in (b"[1, 2]\n", b"{bad\n", b'{"id": 7}\n'):
+            writer.write(line)
+            await writer.drain()
+            errors.append(json.loads(await reader.readline()))
+        writer.close()
+        serving.cancel()
+        await asyncio.gather(serving, return_exceptions=True)
+        return results, errors
+
+    results, errors = asyncio.run(session())
+    expected = evaluate_permutations(plant, orders, permutations, False)
+    for i, result in enumerate(results):
+        assert np.allclose(np.stack(result), expected[:, 2 * i:2 * i + 2])
+    assert [error["id"] for error in errors] == [None, None, 7]
+    assert errors[2]["error"] == "request needs 'permutations' or 'permutation'"
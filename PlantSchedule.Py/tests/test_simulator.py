@@ -0,0 +1,157 @@
+import numpy as np
+import pytest
+from plantdata import Names
+from simulator import Maintenance, OperationType, Order, Plant, Resource, Schedule
+
+PROC, SETUP, MAINTENANCE = OperationType.PROC.value, OperationType.SETUP.value, OperationType.MAINTENANCE.value
+
+
+def assert_sequence(rows: np.ndarray, products: list[int], process_times: list[float],
+                    changeovers: list[list[float]]) -> None:
+    # Operations of one machine do not overlap each other or a maintenance window (windows may overlap),
+    # every process takes its process time and follows the changeover from the product processed right
+    # before it on the machine (none after a maintenance)
+    rows = rows[np.lexsort((rows["end"], rows["start"]))]
+    busy = rows[rows["op"] != MAINTENANCE]
+    assert np.all(busy["start"][1:] >= busy["end"][:-1] - 1e-9)
+    for start, end in rows[rows["op"] == MAINTENANCE][["start", "end"]].tolist():
+        assert not np.any((busy["start"] < end) & (busy["end"] > start))
+    previous, setup = -1, None
+    for order, _, op, start, end in rows.tolist():
+        if op == MAINTENANCE:
+            previous, setup = -1, None
+        elif op == SETUP:
+            setup = (order, start, end)
+        else:
+            product = products[order]
+            assert end - start == pytest.approx(process_times[product])
+            expected = changeovers[product][previous] if previous >= 0 else 0.0
+            if setup is None:
+                assert expected == 0.0
+            else:
+                assert setup[0] == order and setup[2] == pytest.approx(start)
+                assert setup[2] - setup[1] == pytest.approx(expected)
+            previous, setup = product, None
+    assert setup is None, "changeover without a process"
+
+
+def assert_machine_sequences(plant: Plant, orders: list[Order], schedule: Schedule) -> None:
+    products = [plant.data.products.ids[order.product] for order in orders]
+    process_times = plant.data.process_times.T.tolist()
+    for resource in plant.resource_ids:
+        assert_sequence(schedule.machine_operations(resource.id), products, process_times[resource.id],
+                        resource.changeovers)
+
+
+def test_gap_bookings_keep_sequence(plant_orders: tuple[Plant, list[Order]]) -> None:
+    # Requests at random times on one machine, most of them fit a gap before operations booked earlier
+    plant, _ = plant_orders
+    rng = np.random.default_rng(2)
+    process_times = plant.data.process_times.T.tolist()
+    for resource in plant.resource_ids[::3]:
+        eligible = [product for product, time in enumerate(process_times[resource.id]) if time > 0.0]
+        products = rng.choice(eligible, 60).tolist()
+        schedule = Schedule(Names([f"O{order}" for order in range(len(products))]), plant.machines)
+        resource.reset(schedule)
+        resource.block(20.0, 24.0)
+        schedule.append(-1, resource.id, MAINTENANCE, 20.0, 24.0)
+        for order, product in enumerate(products):
+            time, duration = float(rng.uniform(0.0, 60.0)), process_times[resource.id][product]
+            gap, setup, start = resource.earliest_fit(time, product, duration)
+            assert start >= time
+            resource.book(gap, order, product, setup, start, start + duration)
+        assert_sequence(schedule.operations, products, process_times[resource.id], resource.changeovers)
+
+
+def test_insertion_keeps_machine_sequences(plant_orders: tuple[Plant, list[Order]],
+                                           monkeypatch: pytest.MonkeyPatch) -> None:
+    plant, orders = plant_orders
+    machines = plant.machines.names
+    plant.add_maintenance(machines[1], 3.0, 2.0)
+    plant.add_maintenance(machines[-2], 8.0, 1.5)
+    # Count the bookings into a gap before already booked operations, the case under test
+    inserted = []
+    book = Resource.book
+    def counted(resource: Resource, gap: int, *args) -> None:
+        inserted.append(gap < len(resource.gaps) - 1)
+        book(resource, gap, *args)
+    monkeypatch.setattr(Resource, "book", counted)
+    rng = np.random.default_rng(1)
+    for _ in range(20):
+        sequence = [orders[i] for i in rng.permutation(len(orders))]
+        schedule = plant.simulate(sequence)
+        assert_machine_sequences(plant, sequence, schedule)
+        assert not np.isnan(schedule.completion).any()
+        # Changeovers may be done before the order arrives, its processes not
+        for priority, order in enumerate(sequence):
+            rows = schedule.order_operations(priority)
+            assert rows[rows["op"] == PROC]["start"].min() >= order.release
+    assert any(inserted)
+
+
+def test_maintenance_windows_are_kept_free(plant_orders: tuple[Plant, list[Order]]) -> None:
+    plant, orders = plant_orders
+    machine = plant.machines.names[0]
+    plant.add_maintenance(machine, 1.0, 4.0)
+    schedule = plant.simulate(orders)
+    rows = schedule.machine_operations(plant.machines.ids[machine])
+    rows = rows[rows["op"] != MAINTENANCE]
+    assert not np.any((rows["start"] < 5.0) & (rows["end"] > 1.0))
+    assert_machine_sequences(plant, orders, schedule)
+
+
+def operation_keys(schedule: Schedule, rows: np.ndarray) -> list[tuple]:
+    # Rows with order names instead of ids, the ids change when a rush order is inserted
+    return [(schedule.orders[order] if order >= 0 else "", machine, op, start, end)
+            for order, machine, op, start, end in rows.tolist()]
+
+
+@pytest.mark.parametrize("event", ["rush", "maintenance", "both"])
+def test_events_keep_the_frozen_plan(plant_orders: tuple[Plant, list[Order]], event: str) -> None:
+    plant, orders = plant_orders
+    rng = np.random.default_rng(3)
+    for _ in range(5):
+        sequence = [orders[i] for i in rng.permutation(len(orders))]
+        schedule = plant.simulate(sequence)
+        now = float(rng.uniform(0.2, 0.6) * schedule.makespan)
+        plant.advance_to(now)
+        frozen = set(operation_keys(schedule, plant.frozen_operations()))
+        if event in ("rush", "both"):
+            rush = plant.order(f"{sequence[0].product}_Rush", now, now + 5.0)
+            schedule = plant.apply_event(rush, priority=int(rng.integers(0, 5)))
+        if event in ("maintenance", "both"):
+            machine = plant.machines.names[int(rng.integers(len(plant.machines)))]
+            schedule = plant.apply_event(Maintenance(machine, now + 0.5, 3.0))
+        operations = schedule.operations
+        keys = operation_keys(schedule, operations)
+        # Frozen rows come back unchanged, everything else starts at now or later
+        assert frozen <= set(keys)
+        moved = operations[np.array([key not in frozen for key in keys]) & (operations["op"] != MAINTENANCE)]
+        assert np.all(moved["start"] >= now)
+        # Machine sequences around the frozen rows and the new windows
+        assert_machine_sequences(plant, plant.orders, schedule)
+        assert not np.isnan(schedule.completion).any()
+
+
+def test_batch_completion_matches_scalar_decoding(plant_orders: tuple[Plant, list[Order]]) -> None:
+    # The vectorized flow shop decoding gives the completion times of Plant.evaluate for every individual
+    plant, orders = plant_orders
+    rng = np.random.default_rng(4)
+    permutations = np.array([rng.permutation(len(orders)) for _ in range(64)])
+    batch = plant.batch_completion(permutations, orders)
+    scalar = np.array([plant.evaluate(permutation, orders)[0] for permutation in permutations])
+    assert np.array_equal(batch, scalar)
+
+
+def test_incremental_matches_full_evaluation(plant_orders: tuple[Plant, list[Order]]) -> None:
+    # Swap mutants resumed from the checkpoint of their parent, and the parent resumed from itself
+    plant, orders = plant_orders
+    rng = np.random.default_rng(7)
+    parent = rng.permutation(len(orders))
+    completion, checkpoint = plant.evaluate(parent, orders)
+    assert np.array_equal(plant.evaluate(parent, orders, checkpoint)[0], completion)
+    for _ in range(200):
+        child = parent.copy()
+        i, j = rng.choice(len(orders), 2, replace=False)
+        child[[i, j]] = child[[j, i]]
+        assert np.array_equal(plant.evaluate(child, orders, checkpoint)[0], plant.evaluate(child, orders)[0])